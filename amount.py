@@ -0,0 +1,292 @@
+import decimal
+import math
+from fractions import Fraction
+
+def decimal_scale(fraction):
+    """
+    Returns (numerator, scale) with fraction == numerator / 10**scale, or (None, None) if the
+    fraction has no finite decimal representation.
+    """
+    denominator = fraction.denominator
+    twos = fives = 0
+    while denominator % 2 == 0:
+        denominator //= 2
+        twos += 1
+    while denominator % 5 == 0:
+        denominator //= 5
+        fives += 1
+    if denominator != 1:
+        return None, None
+    scale = max(twos, fives)
+    return fraction.numerator * (10 ** scale // fraction.denominator), scale
+
+class Money:
+    """
+    Exact amount as an integer mantissa and a power-of-ten scale, i.e., mantissa / 10**scale, e.g.
+    Money(1250, 2) for 12.50. Addition, subtraction, negation and comparisons of such amounts
+    only need integer operations. Amounts without a finite decimal representation, e.g. after
+    dividing by 3, keep an exact Fraction instead and have mantissa and scale None.
+
+    Money can be used wherever an amount may be a Fraction: it compares and hashes equal to
+    Fractions, ints and Decimals of the same value, and str() returns the same as for a Fraction.
+    Arithmetic with ints and Fractions returns Money where it returns a Fraction for a Fraction,
+    e.g. int(), math.floor() and // return ints like they do for a Fraction.
+    """
+    __slots__ = ("mantissa", "scale", "_fraction")
+
+    def __init__(self, mantissa, scale=0):
+        self.mantissa = mantissa
+        self.scale = scale
+        self._fraction = None
+
+    @classmethod
+    def from_fraction(cls, value):
+        """
+        Returns the Money of an int, Fraction or Decimal.
+        """
+        if type(value) is Money:
+            return value
+        fraction = Fraction(value)
+        mantissa, scale = decimal_scale(fraction)
+        if mantissa is not None:
+            return cls(mantissa, scale)
+        result = cls(None, None)
+        result._fraction = fraction
+        return result
+
+    @property
+    def fraction(self):
+        if self.mantissa is None:
+            return self._fraction
+        return Fraction(self.mantissa, 10 ** self.scale)
+
+    @property
+    def numerator(self):
+        if self.mantissa is None:
+            return self._fraction.numerator
+        return self.mantissa // math.gcd(self.mantissa, 10 ** self.scale)
+
+    @property
+    def denominator(self):
+        if self.mantissa is None:
+            return self._fraction.denominator
+        return 10 ** self.scale // math.gcd(self.mantissa, 10 ** self.scale)
+
+    def __reduce__(self):
+        if self.mantissa is None:
+            return (Money.from_fraction, (self._fraction,))
+        return (Money, (self.mantissa, self.scale))
+
+    def __repr__(self):
+        if self.mantissa is None:
+            return f"Money.from_fraction({self._fraction!r})"
+        return f"Money({self.mantissa}, {self.scale})"
+
+    def __str__(self):
+        numerator, denominator = self.numerator, self.denominator
+        return str(numerator) if denominator == 1 else f"{numerator}/{denominator}"
+
+    def __hash__(self):
+        if self.scale == 0:
+            return hash(self.mantissa)
+        return hash(self.fraction)
+
+    def __bool__(self):
+        return bool(self.mantissa) if self.mantissa is not None else bool(self._fraction)
+
+    def __float__(self):
+        return float(self.fraction)
+
+    # Rounding is rare for amounts, so it goes through the Fraction.
+
+    def __int__(self):
+        return int(self.fraction)
+
+    def __trunc__(self):
+        return math.trunc(self.fraction)
+
+    def __floor__(self):
+        return math.floor(self.fraction)
+
+    def __ceil__(self):
+        return math.ceil(self.fraction)
+
+    def __round__(self, ndigits=None):
+        if ndigits is None:
+            return round(self.fraction)
+        return Money.from_fraction(round(self.fraction, ndigits))
+
+    def __neg__(self):
+        if self.mantissa is None:
+            return Money.from_fraction(-self._fraction)
+        return Money(-self.mantissa, self.scale)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return -self if self < 0 else self
+
+    def _aligned(self, other):
+        """
+        Returns the mantissas of self and other at their common scale and that scale, or None if
+        one of them is not a decimal Money or int.
+        """
+        scale = self.scale
+        if scale is None:
+            return None
+        if type(other) is Money:
+            if other.scale is None:
+                return None
+            if other.scale == scale:
+                return self.mantissa, other.mantissa, scale
+            if other.scale < scale:
+                return self.mantissa, other.mantissa * 10 ** (scale - other.scale), scale
+            return self.mantissa * 10 ** (other.scale - scale), other.mantissa, other.scale
+        if type(other) is int:
+            return self.mantissa, other * 10 ** scale, scale
+        return None
+
+    def __add__(self, other):
+        aligned = self._aligned(other)
+        if aligned is not None:
+            return Money(aligned[0] + aligned[1], aligned[2])
+        other = _fraction(other)
+        if other is NotImplemented:
+            return other
+        return Money.from_fraction(self.fraction + other)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        aligned = self._aligned(other)
+        if aligned is not None:
+            return Money(aligned[0] - aligned[1], aligned[2])
+        other = _fraction(other)
+        if other is NotImplemented:
+            return other
+        return Money.from_fraction(self.fraction - other)
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __mul__(self, other):
+        if self.mantissa is not None:
+            if type(other) is int:
+                return Money(self.mantissa * other, self.scale)
+            if type(other) is Money and other.mantissa is not None:
+                return Money(self.mantissa * other.mantissa, self.scale + other.scale)
+        other = _fraction(other)
+        if other is NotImplemented:
+            return other
+        return Money.from_fraction(self.fraction * other)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        other = _fraction(other)
+        if other is NotImplemented:
+            return other
+        return Money.from_fraction(self.fraction / other)
+
+    def __rtruediv__(self, other):
+        other = _fraction(other)
+        if other is NotImplemented:
+            return other
+        return Money.from_fraction(other / self.fraction)
+
+    def __floordiv__(self, other):
+        other = _fraction(other)
+        if other is NotImplemented:
+            return other
+        return self.fraction // other
+
+    def __rfloordiv__(self, other):
+        other = _fraction(other)
+        if other is NotImplemented:
+            return other
+        return other // self.fraction
+
+    def __mod__(self, other):
+        other = _fraction(other)
+        if other is NotImplemented:
+            return other
+        return Money.from_fraction(self.fraction % other)
+
+    def __rmod__(self, other):
+        other = _fraction(other)
+        if other is NotImplemented:
+            return other
+        return Money.from_fraction(other % self.fraction)
+
+    def __divmod__(self, other):
+        other = _fraction(other)
+        if other is NotImplemented:
+            return other
+        quotient, remainder = divmod(self.fraction, other)
+        return quotient, Money.from_fraction(remainder)
+
+    def __rdivmod__(self, other):
+        other = _fraction(other)
+        if other is NotImplemented:
+            return other
+        quotient, remainder = divmod(other, self.fraction)
+        return quotient, Money.from_fraction(remainder)
+
+    def __pow__(self, other):
+        other = _fraction(other)
+        if other is NotImplemented:
+            return other
+        result = self.fraction ** other
+        # Like for a Fraction, fractional powers are floats.
+        return Money.from_fraction(result) if isinstance(result, (int, Fraction)) else result
+
+    def __rpow__(self, other):
+        other = _fraction(other)
+        if other is NotImplemented:
+            return other
+        result = other ** self.fraction
+        return Money.from_fraction(result) if isinstance(result, (int, Fraction)) else result
+
+    def _compare(self, other):
+        """
+        Returns a pair of numbers comparing like self and other, or None.
+        """
+        aligned = self._aligned(other)
+        if aligned is not None:
+            return aligned[0], aligned[1]
+        if isinstance(other, decimal.Decimal):
+            # Compared by Decimal, like a Fraction is
+            return self.fraction, other
+        other = _fraction(other)
+        if other is NotImplemented:
+            return None
+        return self.fraction, other
+
+    def __eq__(self, other):
+        compared = self._compare(other)
+        return NotImplemented if compared is None else compared[0] == compared[1]
+
+    def __lt__(self, other):
+        compared = self._compare(other)
+        return NotImplemented if compared is None else compared[0] < compared[1]
+
+    def __le__(self, other):
+        compared = self._compare(other)
+        return NotImplemented if compared is None else compared[0] <= compared[1]
+
+    def __gt__(self, other):
+        compared = self._compare(other)
+        return NotImplemented if compared is None else compared[0] > compared[1]
+
+    def __ge__(self, other):
+        compared = self._compare(other)
+        return NotImplemented if compared is None else compared[0] >= compared[1]
+
+def _fraction(value):
+    # Only exact numbers mix with Money.
+    if type(value) is Money:
+        return value.fraction
+    if isinstance(value, (int, Fraction)):
+        return value
+    return NotImplemented
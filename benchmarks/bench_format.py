@@ -0,0 +1,45 @@
+"""
+Compares the Decimal based amount formatting with the integer fast path and format_number_exact,
+which memoizes ints.
+
+Run with: python -m money.benchmarks.bench_format
+"""
+import random
+import timeit
+from fractions import Fraction
+
+from .. import utils
+
+def amounts(n, seed=0):
+    rnd = random.Random(seed)
+    result = []
+    for _ in range(n):
+        cents = rnd.randint(-1000000, 1000000)
+        result.append(cents if rnd.random() < 0.5 else Fraction(cents, rnd.choice([1, 10, 100, 1000])))
+    return result
+
+def main(n=100000):
+    separator = utils.DEFAULT_FORMAT_ARGS.decimal_separator
+    fast = utils._format_number_exact_fast
+    unique = amounts(n)
+    for value in unique:
+        assert fast(value, separator, 2) == utils._format_number_exact_decimal(value, separator, 2), value
+    # Statements repeat the same amounts (rent, subscriptions, ...), which is what the memo cache for ints is for.
+    pool = amounts(n // 50, seed=1)
+    repeated = [random.Random(2).choice(pool) for _ in range(n)]
+
+    for dataset, values in [("unique", unique), ("repeated", repeated)]:
+        utils._format_number_exact_cached.cache_clear()
+        timings = {
+            "decimal": lambda: [utils._format_number_exact_decimal(v, separator, 2) for v in values],
+            "fast path": lambda: [fast(v, separator, 2) for v in values],
+            "format_number_exact": lambda: [utils.format_number_exact(v, utils.DEFAULT_FORMAT_ARGS, 2) for v in values],
+        }
+        baseline = None
+        for name, run in timings.items():
+            seconds = min(timeit.repeat(run, number=1, repeat=3))
+            baseline = baseline or seconds
+            print(f"{dataset:8} {name:20} {seconds:8.3f}s  {n / seconds:12.0f} amounts/s  {baseline / seconds:5.1f}x")
+
+if __name__ == "__main__":
+    main()
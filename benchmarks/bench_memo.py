@@ -0,0 +1,43 @@
+"""
+Compares the TUI converter with and without memo.MemoizedConverter on entries whose merchant
+repeats with other numbers, dates and amounts, and checks that both book every entry alike.
+
+Run with: python -m money.benchmarks.bench_memo
+"""
+import json
+import os
+import tempfile
+import time
+from dataclasses import asdict
+
+from .. import memo, tui, utils
+from ..utils import Entry
+from . import synthetic
+
+def main(n=50000):
+    entries = [e for e in synthetic.entries(n) if isinstance(e, Entry)]
+    # Rules over the merchant only, so that the merchant decides the booking like the signature.
+    rules = [
+        tui.TuiRule(rulenum=i + 1, id=None, hash=None, regex=f"^{merchant} ", account=None, dest_account=f"Aufwendungen:{merchant.title()}")
+        for i, merchant in enumerate(synthetic.MERCHANTS[::2])
+    ]
+    with tempfile.TemporaryDirectory() as workdir:
+        rules_path = os.path.join(workdir, "rules.json")
+        with open(rules_path, "w", encoding="UTF-8") as fp:
+            json.dump([asdict(rule) for rule in rules], fp)
+        converter, _ = tui.configure(format=utils.DEFAULT_FORMAT_ARGS, rules_path=rules_path)
+
+        started = time.perf_counter()
+        direct = [converter(e) for e in entries]
+        print(f"direct    {time.perf_counter() - started:8.3f}s")
+        memoized = memo.MemoizedConverter(converter, lambda e: (e.account, e.text.split()[0]))
+        started = time.perf_counter()
+        cached = [memoized(e) for e in entries]
+        print(f"memoized  {time.perf_counter() - started:8.3f}s  {memoized.summary()['hit_rate']:.0%} hit rate")
+
+    for entry, expected, booking in zip(entries, direct, cached):
+        assert booking == expected, (entry, expected, booking)
+    print(f"same bookings for {len(entries)} entries")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Compares Money with Fraction for what converters do with amounts: summing, splitting a booking
+into shares, comparing and formatting.
+
+Run with: python -m money.benchmarks.bench_money
+"""
+import random
+import timeit
+from fractions import Fraction
+
+from .. import utils
+from ..amount import Money
+
+def cents(n, seed=0):
+    rnd = random.Random(seed)
+    return [rnd.randint(-1000000, 1000000) for _ in range(n)]
+
+def split(amount, shares):
+    # Splits like a converter booking a shared expense, the last part gets the remainder.
+    parts = [amount * share for share in shares[:-1]]
+    return parts + [amount - sum(parts)]
+
+def main(n=100000):
+    values = cents(n)
+    kinds = {
+        "Fraction": [Fraction(c, 100) for c in values],
+        "Money": [Money(c, 2) for c in values],
+    }
+    shares = {
+        "Fraction": [Fraction(1, 2), Fraction(3, 10), Fraction(1, 5)],
+        "Money": [Money(5, 1), Money(3, 1), Money(2, 1)],
+    }
+    for value, fraction, money in zip(values, kinds["Fraction"], kinds["Money"]):
+        assert money == fraction and str(money) == str(fraction) and hash(money) == hash(fraction), value
+    for fraction, money in zip(kinds["Fraction"][:1000], kinds["Money"][:1000]):
+        assert split(money, shares["Money"]) == split(fraction, shares["Fraction"])
+
+    separator = utils.DEFAULT_FORMAT_ARGS.decimal_separator
+    fast = utils._format_number_exact_fast
+    baselines = dict()
+    for kind, amounts in kinds.items():
+        kind_shares = shares[kind]
+        timings = {
+            "sum": lambda: sum(amounts),
+            "split": lambda: [split(a, kind_shares) for a in amounts],
+            "negate": lambda: [-a for a in amounts],
+            "compare": lambda: sorted(amounts),
+            "format": lambda: [fast(a, separator, 2) for a in amounts],
+        }
+        for name, run in timings.items():
+            seconds = min(timeit.repeat(run, number=1, repeat=3))
+            baseline = baselines.setdefault(name, seconds)
+            print(f"{kind:8} {name:8} {seconds:8.3f}s  {n / seconds:12.0f} amounts/s  {baseline / seconds:5.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Compares the memory of entries held as list of namedtuples with the column store, and the time
+to iterate them.
+
+Run with: python -m money.benchmarks.bench_store
+"""
+import gc
+import timeit
+import tracemalloc
+
+from .. import store
+from . import synthetic
+
+def allocated(build):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        value = build()
+        gc.collect()
+        return value, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+def main(n=200000):
+    # Like parsers, the synthetic ledger creates new objects for the fields of every entry.
+    as_list, list_bytes = allocated(lambda: synthetic.entries(n))
+    as_store, store_bytes = allocated(lambda: store.EntryStore(entries=as_list))
+    assert list(as_store) == as_list
+
+    print(f"{len(as_list)} entries")
+    print(f"{'list':8} {list_bytes / 1e6:8.1f} MB")
+    print(f"{'store':8} {store_bytes / 1e6:8.1f} MB  {list_bytes / store_bytes:.1f}x smaller")
+    for name, values in [("list", as_list), ("store", as_store)]:
+        seconds = min(timeit.repeat(lambda: sum(1 for _ in values), number=1, repeat=3))
+        print(f"iterate {name:8} {seconds * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
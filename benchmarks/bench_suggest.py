@@ -0,0 +1,40 @@
+"""
+Compares the TUI suggestions from a full thefuzz scan over all known texts with the trigram
+index, and the latency of account lookups while typing.
+
+Run with: python -m money.benchmarks.bench_suggest
+"""
+import time
+
+from thefuzz import process
+
+from ..suggest import SuggestionIndex
+from ..utils import Entry
+from . import synthetic
+
+def main(n=20000, queries=50):
+    entries = [e for e in synthetic.entries(n + queries) if isinstance(e, Entry)]
+    texts = list(dict.fromkeys(e.text for e in entries[:n]))
+    queries = [e.text for e in entries[n:n + queries]]
+
+    started = time.perf_counter()
+    index = SuggestionIndex(texts)
+    print(f"index {len(texts)} texts  {(time.perf_counter() - started) * 1000:8.1f} ms")
+
+    started = time.perf_counter()
+    scanned = [max(s for _, s in process.extractWithoutOrder(q, texts)) for q in queries]
+    print(f"full scan   {(time.perf_counter() - started) * 1000 / len(queries):8.2f} ms per entry")
+    started = time.perf_counter()
+    indexed = [index.search(q, 1)[0][1] for q in queries]
+    print(f"index       {(time.perf_counter() - started) * 1000 / len(queries):8.2f} ms per entry")
+    print(f"same best score for {sum(a == b for a, b in zip(scanned, indexed))}/{len(queries)} entries")
+
+    accounts = SuggestionIndex(sorted(set(f"Aufwendungen:{m.title()}" for m in synthetic.MERCHANTS) | set(f"Aktiva:Bank{i}" for i in range(1000))))
+    typed = "aufwendungen:lebensmittel"
+    started = time.perf_counter()
+    for i in range(1, len(typed) + 1):
+        accounts.search(typed[:i], 3)
+    print(f"accounts    {(time.perf_counter() - started) * 1000 / len(typed):8.2f} ms per keystroke")
+
+if __name__ == "__main__":
+    main()
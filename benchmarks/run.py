@@ -0,0 +1,143 @@
+"""
+Times the stages of the import pipeline on a synthetic ledger and keeps a history of the results.
+
+Run with: python -m money.benchmarks.run [--entries N] [--rules K] [--history PATH]
+
+Each run is appended to the history file. A stage that got slower than threshold times the last
+run with the same parameters is reported as regression and makes the exit code non-zero.
+"""
+import argparse
+import collections
+import contextlib
+import datetime
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+
+from .. import main, prices, tui, utils
+from ..rules import data
+from . import synthetic
+
+def stages(args, workdir):
+    format_args = utils.DEFAULT_FORMAT_ARGS
+    entries = synthetic.entries(args.entries, accounts=args.accounts, files=args.files, base_path=workdir)
+    rules = synthetic.tui_rules(args.rules, entries, accounts=args.accounts)
+    prices_text = synthetic.prices_journal(args.price_days)
+    rules_path = os.path.join(workdir, "rules.json")
+    with open(rules_path, "w", encoding="UTF-8") as fp:
+        json.dump([asdict(rule) for rule in rules], fp)
+    converter, _ = tui.configure(format=format_args, rules_path=rules_path)
+    state = dict()
+
+    def parse():
+        grouped = collections.defaultdict(lambda: [])
+        for entry in entries:
+            grouped[main.destination_path(workdir, entry)].append(entry)
+        state["grouped"] = grouped
+
+    def entry_ids():
+        data._entry_id_cached.cache_clear()
+        for entry in entries:
+            if isinstance(entry, utils.Entry):
+                data.entry_id(entry)
+
+    def match():
+        index = tui.RuleIndex(rules)
+        for entry in entries:
+            if isinstance(entry, utils.Entry):
+                index.match(entry)
+
+    def assign():
+        state["result"] = main.assign(converter, format_args, state["grouped"])
+
+    def format():
+        for journal in state["result"][2].values():
+            utils.render_journal(journal, format_args)
+
+    def write():
+        main.write(state["result"][2], state["result"][3], format_args)
+
+    def root_journal():
+        main.write_root_journal(workdir, state["result"][3])
+
+    def price_merge():
+        path = os.path.join(workdir, "prices.sqlite")
+        if os.path.exists(path):
+            os.remove(path)
+        store = prices.PriceStore(path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            store.merge(prices.parse_journal(prices_text))
+        store.render()
+        store.close()
+
+    return [
+        ("parse stub", parse),
+        ("entry ids", entry_ids),
+        ("rule matching", match),
+        ("assign", assign),
+        ("format", format),
+        ("write", write),
+        ("root.journal", root_journal),
+        ("price merge", price_merge),
+    ]
+
+def measure(args):
+    results = dict()
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, stage in stages(args, workdir):
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                stage()
+                timings.append(time.perf_counter() - start)
+            results[name] = min(timings)
+    return results
+
+def compare(history, params, results, threshold):
+    previous = next((run for run in reversed(history) if run["params"] == params), None)
+    regressions = []
+    for name, seconds in results.items():
+        before = previous["results"].get(name) if previous else None
+        change = "" if not before else f"  {seconds / before:5.2f}x"
+        print(f"{name:16} {seconds:9.4f}s{change}")
+        if before and seconds > before * threshold:
+            regressions.append(name)
+    return regressions
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--accounts", type=int, default=5)
+    parser.add_argument("--files", type=int, default=120, help="destination files per account")
+    parser.add_argument("--rules", type=int, default=2000)
+    parser.add_argument("--price-days", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--history", default="benchmark_history.json")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown factor reported as regression")
+    return parser.parse_args(argv)
+
+def run(argv):
+    args = parse_args(argv)
+    params = {k: v for k, v in vars(args).items() if k not in ("repeat", "history", "threshold")}
+    results = measure(args)
+
+    history = []
+    if os.path.exists(args.history):
+        with open(args.history, "r", encoding="UTF-8") as fp:
+            history = json.load(fp)
+    regressions = compare(history, params, results, args.threshold)
+    history.append({"timestamp": datetime.datetime.now().isoformat(timespec="seconds"), "params": params, "results": results})
+    with open(args.history, "w", encoding="UTF-8") as fp:
+        json.dump(history, fp, indent=2)
+
+    if regressions:
+        print("Regressions:", ", ".join(regressions))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(run(sys.argv[1:]))
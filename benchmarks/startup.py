@@ -0,0 +1,42 @@
+"""
+Measures the import time of the money entry points with -X importtime and lists the slowest
+imports. Besides module names, import statements can be given, e.g. "from money.tui import configure".
+
+Run with: python -m money.benchmarks.startup [MODULE...]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+def import_times(module):
+    """
+    Returns the (cumulative microseconds, self microseconds, module) tuples of importing module, or
+    running an import statement, in a fresh interpreter.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    statement = module if " " in module else f"import {module}"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], env=env, capture_output=True, text=True, check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times.append((int(cumulative), int(own), name.rstrip()))
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=["money.main", "money.tui", "from money.tui import configure"])
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        times = import_times(module)
+        total = max(cumulative for cumulative, _, _ in times)
+        print(f"{module}: {total / 1000:.1f} ms")
+        for cumulative, own, name in sorted(times, reverse=True)[:args.top]:
+            print(f"  {cumulative / 1000:8.1f} ms  {own / 1000:8.1f} ms self  {name}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Generates synthetic ledgers for the benchmarks: entries over several accounts and destination
+files, TuiRules matching them and a prices journal.
+"""
+import datetime
+import os
+import random
+from fractions import Fraction
+
+from ..rules.data import entry_id
+from ..tui import TuiRule
+from ..utils import Entry, Assert, Raw
+
+MERCHANTS = [
+    "SPAR", "BILLA", "HOFER", "LIDL", "AMAZON", "PAYPAL", "WIENER LINIEN", "OEBB", "A1 TELEKOM", "NETFLIX",
+    "SPOTIFY", "SHELL", "OMV", "IKEA", "MEDIAMARKT", "APOTHEKE", "STARBUCKS", "MCDONALDS", "UBER", "BOLT",
+]
+START = datetime.date(2010, 1, 1)
+
+def entries(n, accounts=5, files=120, seed=0, base_path="/ledger"):
+    """
+    Returns n Entry tuples (plus an Assert per file and a few Raw entries) spread over accounts
+    source accounts and files source files per account.
+    """
+    rnd = random.Random(seed)
+    result = []
+    for i in range(n):
+        account = rnd.randrange(accounts)
+        source = os.path.join(base_path, "input", f"bank{account}", f"statement{rnd.randrange(files):04d}.pdf")
+        text = f"{rnd.choice(MERCHANTS)} {rnd.randrange(1000):03d} KARTE {rnd.randrange(10000):04d}"
+        cents = rnd.randint(-50000, 5000)
+        amount = cents if rnd.random() < 0.5 else Fraction(cents, 100)
+        date = START + datetime.timedelta(days=rnd.randrange(5000))
+        result.append(Entry(source, f"Aktiva:Bank{account}", date, text, amount, "EUR"))
+        if i % 1000 == 0:
+            result.append(Raw(source, date, "Transfer", [(f"Aktiva:Bank{account}", Fraction(-1), "EUR"), ("Aktiva:Cash", Fraction(1), "EUR")]))
+    for account in range(accounts):
+        for file in range(files):
+            source = os.path.join(base_path, "input", f"bank{account}", f"statement{file:04d}.pdf")
+            result.append(Assert(source, f"Aktiva:Bank{account}", START + datetime.timedelta(days=file * 30), Fraction(0), "EUR"))
+    return result
+
+def tui_rules(k, entries, accounts=5, seed=0):
+    """
+    Returns k TuiRules: a fifth pinned to single entries by hash, the rest regexes over the
+    merchant names, half of them restricted to an account.
+    """
+    rnd = random.Random(seed)
+    candidates = [e for e in entries if isinstance(e, Entry)]
+    rules = []
+    for i in range(k):
+        kind = rnd.random()
+        hash, regex, account = None, None, None
+        if kind < 0.2:
+            hash = entry_id(rnd.choice(candidates))
+        else:
+            regex = f"{rnd.choice(MERCHANTS)} {rnd.randrange(1000):03d}" if rnd.random() < 0.8 else f"^{rnd.choice(MERCHANTS)}.*KARTE 1"
+            if kind < 0.6:
+                account = f"Aktiva:Bank{rnd.randrange(accounts)}"
+        rules.append(TuiRule(rulenum=i + 1, id=None, hash=hash, regex=regex, account=account, dest_account=f"Aufwendungen:Kategorie{rnd.randrange(50)}"))
+    return rules
+
+def prices_journal(days, commodities=("VGWL", "IS_N", "IBCZ", "USD", "CHF"), seed=0):
+    rnd = random.Random(seed)
+    lines = []
+    for day in range(days):
+        date = START + datetime.timedelta(days=day)
+        for commodity in commodities:
+            lines.append(f"P {date} {commodity} {rnd.randrange(1, 200)},{rnd.randrange(10000):04d} EUR")
+    return "\n".join(lines)
@@ -0,0 +1,110 @@
+import hashlib
+import importlib.util
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import zlib
+
+from . import incremental, utils
+
+DEFAULT_MAX_BYTES = 1 << 30
+
+def module_version(name):
+    """
+    Returns a string identifying the code of a parser module without importing it: the hash of the
+    source of its top-level package, which includes the helper modules it may import, e.g. the whole
+    parser package for parser.foo, and the hash of utils, which parsers build on. Returns None if
+    there is no source to hash, e.g. for built-in modules.
+    """
+    spec = importlib.util.find_spec(name.split(".")[0])
+    if spec is None:
+        return None
+    if spec.submodule_search_locations is not None:
+        # Namespace packages have no origin and may span several directories.
+        paths = list(spec.submodule_search_locations)
+    elif spec.origin is not None and os.path.isfile(spec.origin):
+        paths = [spec.origin]
+    else:
+        return None
+    if len(paths) == 0:
+        return None
+    return ":".join(incremental.hash_path(path) for path in paths + [utils.__file__])
+
+def make_key(*parts):
+    return hashlib.sha256("\0".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+class ParseCache:
+    """
+    Stores the Entry, Assert and Raw tuples returned by a parser as compressed pickles, one file per
+    namespace (the parser module) and key. The least recently used files are removed once the cache
+    grows beyond max_bytes.
+    """
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        # Parsers of the pipeline mode put their entries from several threads at the same time.
+        self._evict_lock = threading.Lock()
+
+    def _file(self, namespace, key):
+        return os.path.join(self.path, namespace, key + ".pickle.z")
+
+    def get(self, namespace, key):
+        path = self._file(namespace, key)
+        try:
+            with open(path, "rb") as fp:
+                value = pickle.loads(zlib.decompress(fp.read()))
+        except (OSError, zlib.error, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        os.utime(path)
+        return value
+
+    def put(self, namespace, key, value):
+        path = self._file(namespace, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def invalidate(self, namespace=None):
+        path = self.path if namespace is None else os.path.join(self.path, namespace)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+
+    def evict(self):
+        with self._evict_lock:
+            files = []
+            for root, _, names in os.walk(self.path):
+                for name in names:
+                    # Files being written by put
+                    if name.endswith(".tmp"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+            total = sum(f[1] for f in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+def parse_cache(base_path, max_bytes=DEFAULT_MAX_BYTES):
+    return ParseCache(incremental.cache_path(base_path, "parsed"), max_bytes)
+
+if __name__ == "__main__":
+    # Usage: python -m money.cache BASE_PATH [PARSER...]
+    # Removes the cached entries of the given parser modules, or of all parsers.
+    base_path, parsers = sys.argv[1], sys.argv[2:]
+    for parser in parsers or [None]:
+        parse_cache(base_path).invalidate(parser)
@@ -1,45 +1,116 @@
-import requests
+import concurrent.futures
+import datetime
+import json
+import os
+import threading
+import time
 
 from .utils import format_number_exact, parse_num_us, escape_commodity
 
 QUERY_URL = "https://www.alphavantage.co/query"
+# Alphavantage's free plan allows 5 requests per minute.
+REQUESTS_PER_MINUTE = 5
+# Compact gives us 100 datapoints, i.e., 100 trading days.
+COMPACT_DAYS = 100
 
-def fetch(api_key, load, format_args):
-	output = ""
-	for value in load:
+class RateLimiter:
+	"""
+	Token bucket allowing burst requests at once and refilling requests_per_minute tokens per minute.
+	"""
+	def __init__(self, requests_per_minute, burst=None):
+		self.rate = requests_per_minute / 60
+		self.capacity = burst or requests_per_minute
+		self.tokens = self.capacity
+		self.updated = time.monotonic()
+		self.lock = threading.Lock()
+
+	def acquire(self):
+		while True:
+			with self.lock:
+				now = time.monotonic()
+				self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+				self.updated = now
+				if self.tokens >= 1:
+					self.tokens -= 1
+					return
+				wait = (1 - self.tokens) / self.rate
+			time.sleep(wait)
+
+def load_last_dates(cache_path):
+	if cache_path is None or not os.path.exists(cache_path):
+		return dict()
+	with open(cache_path, "r", encoding="UTF-8") as fp:
+		return json.load(fp)
+
+def save_last_dates(cache_path, last_dates):
+	if cache_path is None:
+		return
+	os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+	with open(cache_path, "w", encoding="UTF-8") as fp:
+		json.dump(last_dates, fp, indent=2, sort_keys=True)
+
+def fetch(api_key, load, format_args, *, query_url=QUERY_URL, cache_path=None, requests_per_minute=REQUESTS_PER_MINUTE, max_workers=4, session=None):
+	"""
+	Fetches the prices of all equities and FX pairs in load and returns them as hledger P directives.
+
+	Requests run in parallel over one HTTP session and are limited to requests_per_minute. If
+	cache_path is set, the last date fetched for each symbol is stored there and symbols that were
+	fetched within the last COMPACT_DAYS days are requested with the compact output size only.
+	"""
+	if session is None:
+		# Only imported when prices are fetched, as it takes a while
+		import requests
+		session = requests.Session()
+	limiter = RateLimiter(requests_per_minute)
+	last_dates = load_last_dates(cache_path)
+	today = datetime.date.today()
+
+	def fetch_one(value):
 		type = value['type']
 
 		if type == 'EQUITY':
 			key = value['key']
 			symbol = value['symbol']
 			currency = value['currency']
-			result = requests.get(QUERY_URL, params={
+			params = {
 				"function": 'TIME_SERIES_DAILY',
 				"symbol": symbol,
 				# Full is only available on the premium plan
-				# Compact gives us 100 datapoints (~3 months)
 				# Given that we keep old datapoints and merge them with the new ones, this should be good enough in practice (as long as we never need historical price data)
 				"outputsize": "compact",
 				"apikey": api_key
-			})
-			result = result.json()
-			for date, values in result["Time Series (Daily)"].items():
-				price = parse_num_us(values['4. close'])
-				output += f"P {date} {escape_commodity(key)} {format_number_exact(price, format_args, min_decimal=4)} {escape_commodity(currency)}\n"
+			}
+			series, commodity, cache_key = "Time Series (Daily)", key, f"EQUITY {symbol} {currency}"
 		elif type == 'FX':
 			from_symbol = value['from_symbol']
 			to_symbol = value['to_symbol']
-			result = requests.get(QUERY_URL, params={
+			last_date = last_dates.get(f"FX {from_symbol} {to_symbol}")
+			recent = last_date is not None and (today - datetime.date.fromisoformat(last_date)).days < COMPACT_DAYS
+			params = {
 				"function": 'FX_DAILY',
 				"from_symbol": from_symbol,
 				"to_symbol": to_symbol,
-				"outputsize": "full",
+				"outputsize": "compact" if recent else "full",
 				"apikey": api_key
-			})
-			result = result.json()
-			for date, values in result["Time Series FX (Daily)"].items():
-				price = parse_num_us(values['4. close'])
-				output += f"P {date} {escape_commodity(from_symbol)} {format_number_exact(price, format_args, min_decimal=4)} {escape_commodity(to_symbol)}\n"
+			}
+			series, commodity, currency, cache_key = "Time Series FX (Daily)", from_symbol, to_symbol, f"FX {from_symbol} {to_symbol}"
 		else:
 			assert False, "Unknown type"
-	return output
+
+		limiter.acquire()
+		result = session.get(query_url, params=params)
+		result = result.json()
+		output = []
+		for date, values in result[series].items():
+			price = parse_num_us(values['4. close'])
+			output.append(f"P {date} {escape_commodity(commodity)} {format_number_exact(price, format_args, min_decimal=4)} {escape_commodity(currency)}\n")
+		return cache_key, max(result[series].keys(), default=None), output
+
+	output = []
+	with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+		for cache_key, last_date, lines in executor.map(fetch_one, load):
+			if last_date is not None:
+				last_dates[cache_key] = last_date
+			output += lines
+	save_last_dates(cache_path, last_dates)
+	return "".join(output)
@@ -0,0 +1,100 @@
+import glob
+import json
+import mmap
+import os
+import re
+
+# Patterns run directly on the memory-mapped files, so that large journals are never read into
+# memory as a whole.
+_DIRECTIVES = re.compile(rb"^[ \t]*(?:(account)[ \t]+([^;\r\n]*[^;\s])|(include)[ \t]+([^;\r\n]*[^;\s]))", re.MULTILINE | re.IGNORECASE)
+_PRICES = re.compile(rb'^P[ \t]+(\S+)[ \t]+("[^"\r\n]*"|\S+)[ \t]+(\S+)[ \t]+("[^"\r\n]*"|\S+)', re.MULTILINE)
+
+def _finditer(pattern, path):
+    """
+    Yields the matches of a bytes pattern in a file, which is memory-mapped while it is scanned.
+    """
+    with open(path, "rb") as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for match in pattern.finditer(data):
+                yield match
+
+class Scanner:
+    """
+    Scans hledger journals for account directives and P directives without reading them into
+    memory, following include directives only as far as the results are consumed. The accounts
+    and includes of each file are cached by its mtime and size, in cache_path if it is set, so
+    unchanged journals are not scanned again. Prices are not cached, they go to the price store.
+
+    Journals in the directories in exclude, e.g. the output directory, which is rewritten on every
+    run, are neither scanned nor followed.
+    """
+    def __init__(self, cache_path=None, exclude=()):
+        self.cache_path = cache_path
+        self.exclude = [os.path.join(os.path.abspath(path), "") for path in exclude]
+        self._files = dict()
+        self._changed = False
+        if cache_path is not None and os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="UTF-8") as fp:
+                self._files = json.load(fp)
+
+    def save(self):
+        if self.cache_path is None or not self._changed:
+            return
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        with open(self.cache_path, "w", encoding="UTF-8") as fp:
+            json.dump(self._files, fp)
+        self._changed = False
+
+    def _directives(self, path):
+        stat = os.stat(path)
+        known = self._files.get(path)
+        if known is not None and known["mtime_ns"] == stat.st_mtime_ns and known["size"] == stat.st_size:
+            return known
+        accounts = []
+        includes = []
+        for match in _finditer(_DIRECTIVES, path):
+            if match.group(1):
+                accounts.append(match.group(2).decode("utf-8"))
+            else:
+                includes.append(match.group(4).decode("utf-8"))
+        known = self._files[path] = dict(mtime_ns=stat.st_mtime_ns, size=stat.st_size, accounts=accounts, includes=includes)
+        self._changed = True
+        return known
+
+    def journals(self, path):
+        """
+        Yields the path of a journal and, recursively, of the journals it includes. Include paths
+        are relative to the including journal and may contain glob patterns. Each journal is only
+        yielded once.
+        """
+        seen = set()
+        pending = [os.path.abspath(path)]
+        while len(pending) > 0:
+            path = pending.pop()
+            if path in seen or not os.path.isfile(path) or any(path.startswith(excluded) for excluded in self.exclude):
+                continue
+            seen.add(path)
+            yield path
+            included = []
+            for include in self._directives(path)["includes"]:
+                include = os.path.join(os.path.dirname(path), os.path.expanduser(include))
+                included.extend(os.path.normpath(p) for p in sorted(glob.glob(include)))
+            pending.extend(reversed(included))
+
+    def accounts(self, path):
+        """
+        Yields the names of the accounts declared in a journal and the journals it includes.
+        """
+        for journal in self.journals(path):
+            yield from self._directives(journal)["accounts"]
+
+    def prices(self, path):
+        """
+        Yields the (date, commodity, price, currency) tuples of the P directives in a journal and
+        the journals it includes, escaped as in the journal like prices.parse_journal.
+        """
+        for journal in self.journals(path):
+            for match in _finditer(_PRICES, journal):
+                yield tuple(group.decode("utf-8") for group in match.groups())
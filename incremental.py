@@ -0,0 +1,116 @@
+import functools
+import hashlib
+import json
+import os
+
+CACHE_DIR = ".cache"
+
+def cache_path(base_path, *parts):
+    return os.path.join(base_path, CACHE_DIR, *parts)
+
+def hash_path(path):
+    """
+    Returns a hex digest over the content of a file or, recursively, over all files of a directory
+    including their relative paths. Python bytecode caches are ignored.
+    """
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, path).encode("utf-8") + b"\0")
+                digest.update(hash_path(file_path).encode("ascii"))
+    elif os.path.isfile(path):
+        stat = os.stat(path)
+        return _hash_file(path, stat.st_mtime_ns, stat.st_size)
+    return digest.hexdigest()
+
+# Maps file paths to (mtime_ns, size, digest) of earlier runs, see Manifest
+known_hashes = dict()
+
+@functools.lru_cache(maxsize=None)
+def _hash_file(path, mtime_ns, size):
+    known = known_hashes.get(path)
+    if known is not None and known[0] == mtime_ns and known[1] == size:
+        return known[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for block in iter(lambda: fp.read(1 << 20), b""):
+            digest.update(block)
+    known_hashes[path] = (mtime_ns, size, digest.hexdigest())
+    return digest.hexdigest()
+
+class Manifest:
+    """
+    Remembers the content hashes of the rules module, config.ini and each input directory of the
+    previous run, together with the output files written for each input and the number of
+    entries left unassigned. The hashes of all files are kept by mtime and size, so unchanged
+    files are not read again.
+    """
+    def __init__(self, base_path):
+        self.base_path = base_path
+        self.path = cache_path(base_path, "manifest.json")
+        self.inputs = dict()
+        self.unassigned = None
+        self._previous = dict()
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="UTF-8") as fp:
+                self._previous = json.load(fp)
+            for path, known in self._previous.get("files", dict()).items():
+                known_hashes.setdefault(path, tuple(known))
+        self.rules = hash_path(os.path.join(base_path, "rules"))
+        self.config = hash_path(os.path.join(base_path, "config.ini"))
+
+    def settings_changed(self):
+        return self._previous.get("rules") != self.rules or self._previous.get("config") != self.config
+
+    def input_digest(self, name):
+        # The config is part of the digest as it contains the parser arguments of the input.
+        return hashlib.sha256((self.config + hash_path(os.path.join(self.base_path, "input", name))).encode("ascii")).hexdigest()
+
+    def input_changed(self, name, digest):
+        previous = self._previous.get("inputs", dict()).get(name)
+        return previous is None or previous["digest"] != digest
+
+    def set_input(self, name, digest, outputs):
+        self.inputs[name] = {"digest": digest, "outputs": sorted(outputs)}
+
+    def unchanged(self, names):
+        """
+        Returns whether the settings and the inputs with the given names are the same as in the
+        previous run, which left no entry unassigned, and all of its outputs still exist. If so,
+        the inputs are taken over from the previous run.
+        """
+        previous = self._previous.get("inputs", dict())
+        if self.settings_changed() or self._previous.get("unassigned") != 0 or set(names) != set(previous):
+            return False
+        digests = dict()
+        for name in names:
+            digests[name] = self.input_digest(name)
+            if self.input_changed(name, digests[name]):
+                return False
+            if not all(os.path.exists(os.path.join(self.base_path, output)) for output in previous[name]["outputs"]):
+                return False
+        if not os.path.exists(os.path.join(self.base_path, "output", "root.journal")):
+            return False
+        for name in names:
+            self.set_input(name, digests[name], previous[name]["outputs"])
+        self.unassigned = 0
+        return True
+
+    def stale_outputs(self):
+        current = set(output for i in self.inputs.values() for output in i["outputs"])
+        previous = set(output for i in self._previous.get("inputs", dict()).values() for output in i["outputs"])
+        return previous - current
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w", encoding="UTF-8") as fp:
+            json.dump({
+                "rules": self.rules,
+                "config": self.config,
+                "inputs": self.inputs,
+                "unassigned": self.unassigned,
+                "files": {path: known for path, known in known_hashes.items() if os.path.exists(path)},
+            }, fp, indent=2)
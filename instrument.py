@@ -0,0 +1,86 @@
+import contextlib
+import cProfile
+import datetime
+import json
+import pstats
+import sys
+import threading
+import time
+
+def peak_rss_kb():
+    """
+    Returns the peak RSS of this process in kilobytes, or None where it is unknown, e.g. on Windows.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+class Recorder:
+    """
+    Records wall time, CPU time and peak RSS of the stages of a run. Stages can attach further
+    values, e.g. entry counts or bytes written, to the dict they get from stage().
+    """
+    def __init__(self):
+        self.started = datetime.datetime.now()
+        self.stages = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name, **values):
+        record = {"stage": name, **values}
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = time.perf_counter() - wall
+            # CPU time is per process, so it includes other stages running at the same time.
+            record["cpu_seconds"] = time.process_time() - cpu
+            record["peak_rss_kb"] = peak_rss_kb()
+            with self._lock:
+                self.stages.append(record)
+
+    def report(self, **extra):
+        return {
+            "started": self.started.isoformat(timespec="seconds"),
+            "wall_seconds": (datetime.datetime.now() - self.started).total_seconds(),
+            "peak_rss_kb": peak_rss_kb(),
+            "stages": self.stages,
+            **extra,
+        }
+
+    def write(self, path, **extra):
+        with open(path, "w", encoding="UTF-8") as fp:
+            json.dump(self.report(**extra), fp, indent=2, default=str)
+
+class ProfiledConverter:
+    """
+    Wraps a converter and profiles every call with cProfile.
+    """
+    def __init__(self, converter):
+        self.converter = converter
+        self.profile = cProfile.Profile()
+
+    def __call__(self, entry):
+        return self.profile.runcall(self.converter, entry)
+
+    def top(self, n=30):
+        """
+        Returns the n functions with the highest own time spent in the converter.
+        """
+        self.profile.create_stats()
+        if not self.profile.stats:
+            # Nothing was converted in this process, e.g. with parallel_assign, and pstats refuses empty profiles.
+            return []
+        stats = pstats.Stats(self.profile).stats
+        rows = sorted(stats.items(), key=lambda i: i[1][2], reverse=True)[:n]
+        return [
+            {"function": f"{file}:{line}({function})", "calls": calls, "own_seconds": own, "cumulative_seconds": cumulative}
+            for (file, line, function), (_, calls, own, cumulative, _) in rows
+        ]
+
+    def dump(self, path):
+        self.profile.dump_stats(path)
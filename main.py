@@ -1,19 +1,43 @@
-import multiprocessing, os, shutil, datetime, importlib, collections, dataclasses
-from . import utils, fetch_prices
+import os, shutil, datetime, importlib, collections, dataclasses, concurrent.futures, tempfile
+from . import utils, fetch_prices, incremental, cache, prices, instrument, store, hledger, memo, scheduler
 from .rules.data import Booking, BookingLine, assert_is_booking
 # Intentionally imported to re-export
 from .utils import FormatArgs
 
 
+class Parser:
+    """
+    Calls the main function of a parser module. The module is only imported when the parser is
+    called, as parsers may depend on heavy libraries, e.g. for PDFs.
+    """
+    def __init__(self, module_name, source, kwargs):
+        self.module_name = module_name
+        self.source = source
+        self.kwargs = kwargs
+
+    @property
+    def module(self):
+        return importlib.import_module(self.module_name)
+
+    def __call__(self, pool):
+        return self.module.main(pool=pool, source=self.source, **self.kwargs)
+
+    def cache_key(self):
+        """
+        Returns the key of the parse cache, or None if the version of the module is unknown.
+        """
+        version = cache.module_version(self.module_name)
+        if version is None:
+            return None
+        return cache.make_key(incremental.hash_path(self.source), version, sorted(self.kwargs.items()))
+
 def init_parsers(base_path, config):
     parsers = dict()
     for section in config.sections():
         if section.startswith("input."):
-            parser_module = importlib.import_module("parser." + config[section].get("parser"))
             name = section[len("input."):]
             source = os.path.join(base_path, "input", name)
-            parser = lambda pool, source=source, parser_module=parser_module, kwargs=dict(config[section]): parser_module.main(pool=pool, source=source, **kwargs)
-            parsers[name] = parser
+            parsers[name] = Parser("parser." + config[section].get("parser"), source, dict(config[section]))
     return parsers
 
 def delete_output(base_path):
@@ -31,6 +55,25 @@ class Config:
     format: FormatArgs
     unassigned_handler: any = None
     fallback_handler: any = None
+    incremental: bool = False
+    parse_cache: bool = False
+    parse_cache_max_bytes: int = cache.DEFAULT_MAX_BYTES
+    pipeline: bool = False
+    report: bool = False
+    profile_converter: bool = False
+    compact_entries: bool = False
+    batch_converter: any = None
+    # Converts the entries in the worker processes, which get the converter and batch converter
+    # when they are started. They are inherited where processes are forked, e.g. on Linux, and
+    # have to be picklable otherwise. Only used by the first pass over all entries and not in
+    # pipeline mode.
+    parallel_assign: bool = False
+    # Calls the converter only once per signature of the entries, see memo.MemoizedConverter.
+    # The hits in the worker processes of parallel_assign are not included in the reported hit
+    # rate, neither are their calls in the profile of profile_converter.
+    signature: any = None
+    # Default timeout in seconds of the tasks parsers submit to the scheduler, see scheduler.Scheduler
+    task_timeout: any = None
 
 Input = collections.namedtuple("input", (
     "name",
@@ -41,119 +84,516 @@ Prices = collections.namedtuple("Prices", (
     "alphavantage_key",
     "equities",
     "forex",
-))
+    "requests_per_minute",
+), defaults=(fetch_prices.REQUESTS_PER_MINUTE,))
 
-def assign(converter, format_args, entries):
+def assign(converter, format_args, entries, previous=None, reconvert=None, batch_converter=None):
+    """
+    Converts all entries and returns the unassigned entries, the bookings of the assigned entries,
+    the bookings and asserts to write per destination file (see utils.render_journal) and the
+    latest date per destination file.
+
+    If previous, the result of an earlier assign over the same entries, and reconvert are given,
+    only the entries in reconvert are passed to the converter. All other entries keep their
+    previous booking and files without an entry to reconvert are taken from previous as they are.
+
+    If a batch_converter is given, all entries to convert are passed to it at once first and only
+    the entries it leaves unassigned are passed to the converter.
+    """
     unassigned_entries = []
     assigned_entries = {}
-    writes = {}
+    journals = {}
     output_files = {}
+    if previous is not None:
+        previous_unassigned, previous_assigned, previous_journals, previous_output_files = previous
+        reconvert = set(reconvert)
+        reused_files = set(f for f, e in entries.items() if not any(isinstance(entry, utils.Entry) and entry in reconvert for entry in e))
+    # Iterating an EntryStore rebuilds its entries. The ones of previous are used instead, so that
+    # they are not held twice.
+    known = None
+    if previous is not None and any(isinstance(e, store.EntryStore) for e in entries.values()):
+        known = {entry: entry for entry in previous_unassigned}
+        known.update((entry, entry) for entry in previous_assigned)
+    batch_bookings = dict()
+    if batch_converter is not None:
+        batch_bookings = convert_batch(batch_converter, [
+            entry
+            for dest_file, file_entries in entries.items() if previous is None or dest_file not in reused_files
+            for entry in file_entries if isinstance(entry, utils.Entry) and (previous is None or entry in reconvert)
+        ])
     for dest_file, entries in entries.items():
-        writes[dest_file] = []
+        if previous is not None and dest_file in reused_files:
+            for entry in entries:
+                if isinstance(entry, utils.Entry):
+                    if known is not None:
+                        entry = known.get(entry, entry)
+                    booking = previous_assigned.get(entry)
+                    if booking is None:
+                        unassigned_entries.append(entry)
+                    else:
+                        assigned_entries[entry] = booking
+            journals[dest_file] = previous_journals[dest_file]
+            output_files[dest_file] = previous_output_files[dest_file]
+            continue
+        journal = journals[dest_file] = []
         output_files[dest_file] = datetime.date(1000, 1, 1)
         for entry in entries:
             if isinstance(entry, utils.Entry):
-                booking = converter(entry)
+                if known is not None:
+                    entry = known.get(entry, entry)
+                if previous is None or entry in reconvert:
+                    booking = batch_bookings.get(entry)
+                    if booking is None:
+                        booking = converter(entry)
+                else:
+                    booking = previous_assigned.get(entry)
                 if booking is None:
                     unassigned_entries.append(entry)
                 else:
                     assert_is_booking(booking)
                     assigned_entries[entry] = booking
-                    writes[dest_file].append(lambda fp, booking=booking: utils.write_booking(fp, booking, format_args))
+                    journal.append(booking)
             elif isinstance(entry, utils.Assert):
-                writes[dest_file].append(lambda fp, entry=entry: utils.write_assert(fp, entry.account, entry.date, entry.amount, entry.currency, format_args))
+                journal.append(entry)
             elif isinstance(entry, utils.Raw):
-                writes[dest_file].append(lambda fp, entry=entry: utils.write_booking(fp, Booking(date=entry.date, description=entry.text, lines = [
+                journal.append(Booking(date=entry.date, description=entry.text, lines = [
                     BookingLine(account=line[0], amount=line[1], commodity=line[2])
                     for line in entry.lines
-                ]), format_args))
+                ]))
             else:
                 raise Exception("Unknown thing in entries: " + repr(entry))
             output_files[dest_file] = max(output_files[dest_file], entry.date)
-    return unassigned_entries, assigned_entries, writes, output_files
+    return unassigned_entries, assigned_entries, journals, output_files
 
-def write(writes, file_order):
-    for dest_file, writes in sorted(writes.items(), key=lambda e: file_order[e[0]]):
-        os.makedirs(os.path.dirname(dest_file), exist_ok=True)
-        with open(dest_file, "w", encoding="UTF-8") as fp:
-            for write in writes:
-                write(fp)
+# The converter, batch converter and format args of a worker process, see init_assign_worker
+_assign_worker = None
 
-def main(config):
-    base_path = config.base_path
-    format_args = config.format
+def init_assign_worker(converter, batch_converter, format_args):
+    global _assign_worker
+    _assign_worker = (converter, batch_converter, format_args)
 
-    commodity_prices = ''
-    should_fetch_commodity_prices = True
-    prices_path_rel = os.path.join("output", "prices.journal")
-    prices_path = os.path.join(base_path, prices_path_rel)
-    if os.path.exists(prices_path):
-        with open(prices_path) as fp:
-            commodity_prices = fp.read()
+def assign_file(item):
+    dest_file, entries = item
+    converter, batch_converter, format_args = _assign_worker
+    unassigned, assigned, journals, output_files = assign(converter, format_args, {dest_file: entries}, batch_converter=batch_converter)
+    journal = journals[dest_file]
+    # The entries are returned as indices, the parent process has them already.
+    unassigned = set(unassigned)
+    unassigned = [i for i, entry in enumerate(entries) if isinstance(entry, utils.Entry) and entry in unassigned]
+    assigned = [(i, assigned[entry]) for i, entry in enumerate(entries) if isinstance(entry, utils.Entry) and entry in assigned]
+    return unassigned, assigned, journal, output_files[dest_file], utils.render_journal(journal, format_args)
 
-        mtime = datetime.datetime.fromtimestamp(os.stat(prices_path).st_mtime)
-        should_fetch_commodity_prices = datetime.datetime.now() - mtime > datetime.timedelta(days=2)
+def assign_parallel(pool, entries):
+    """
+    Like assign without previous, but the destination files are converted and rendered by the
+    worker processes of pool, which have to be initialized with init_assign_worker. Returns the
+    result of assign and the rendered journals for write.
+    """
+    unassigned_entries = []
+    assigned_entries = {}
+    journals = {}
+    output_files = {}
+    rendered = {}
+    files = list(entries.items())
+    chunksize = max(1, len(files) // (4 * (os.cpu_count() or 1)))
+    # imap returns the results in order, so the result is the same as the one of a serial assign.
+    for (dest_file, file_entries), (unassigned, assigned, journal, date, text) in zip(files, pool.imap(assign_file, files, chunksize)):
+        unassigned_entries += [file_entries[i] for i in unassigned]
+        for i, booking in assigned:
+            assigned_entries[file_entries[i]] = booking
+        journals[dest_file] = journal
+        output_files[dest_file] = date
+        rendered[dest_file] = (journal, text)
+    return (unassigned_entries, assigned_entries, journals, output_files), rendered
 
-    delete_output(base_path)
-    all_output_files = dict()
-    
-    if should_fetch_commodity_prices:
-        print("Fetching prices")
-        alphavantage_api_key = config.prices.alphavantage_key
-        equity_entries = [{'type': 'EQUITY', 'key': v[0], 'symbol': v[1], 'currency': v[2]} for v in config.prices.equities]
-        fx_entries = [{'type': 'FX', 'from_symbol': v[0], 'to_symbol': v[1]} for v in config.prices.forex]
-        new_commodity_prices = fetch_prices.fetch(alphavantage_api_key, equity_entries + fx_entries, format_args)
-        commodity_prices = merge_prices(existing_prices=commodity_prices, new_prices=new_commodity_prices)
-
-    with open(prices_path, "w", encoding="UTF-8") as fp:
-        fp.write(commodity_prices)
-    all_output_files[prices_path_rel] = datetime.date(1000, 1, 1)
+def convert_batch(batch_converter, entries):
+    """
+    Passes the entries as store.EntryStore to the batch converter. It returns a sequence with a
+    Booking, the name of the destination account or None for every entry. Returns a dict mapping
+    the assigned entries to their bookings.
+    """
+    if len(entries) == 0:
+        return dict()
+    results = batch_converter(store.EntryStore(entries=entries))
+    if len(results) != len(entries):
+        raise Exception(f"Batch converter returned {len(results)} results for {len(entries)} entries")
+    bookings = dict()
+    for entry, result in zip(entries, results):
+        if isinstance(result, str):
+            result = Booking(date=entry.date, description=entry.text, lines=[
+                BookingLine(account=entry.account, amount=entry.amount, commodity=entry.currency),
+                BookingLine(account=result, amount=None, commodity=None),
+            ])
+        if result is not None:
+            assert_is_booking(result)
+            bookings[entry] = result
+    return bookings
+
+def destination_path(base_path, entry):
+    rest, filename = os.path.split(entry.source)
+    rest, directory = os.path.split(rest)
+
+    dot = filename.rfind(".")
+    if dot >= 0:
+        filename = filename[:dot] + ".journal"
+
+    return os.path.join(base_path, "output", directory, filename)
+
+def entry_container(config):
+    """
+    Returns a factory for the lists of entries per destination file. With compact_entries, all
+    lists are column stores sharing one string table.
+    """
+    if not config.compact_entries:
+        return list
+    strings = store.StringTable()
+    return lambda: store.EntryStore(strings)
 
-    entries = collections.defaultdict(lambda: [])  # maps destination path to list of entries
-    with multiprocessing.Pool() as pool:
-        for input in config.inputs:
-            name, parser = input.name, input.parser
-            print("Parsing", name)
-            for entry in parser(pool):
-                rest, filename = os.path.split(entry.source)
-                rest, directory = os.path.split(rest)
+def parse_input(input, pool, manifest, parse_cache, recorder):
+    """
+    Returns the entries of an input, whether they come from the parse cache and the digest of the
+    input for the manifest. Inputs created by init_parsers are cached by the content of their
+    directory, their arguments and the version of their parser module, other inputs only in
+    incremental mode by their manifest digest.
+    """
+    digest = manifest.input_digest(input.name) if manifest is not None else None
+    namespace, key = None, None
+    if parse_cache is not None and isinstance(input.parser, Parser):
+        namespace, key = input.parser.module_name.split(".")[-1], input.parser.cache_key()
+    elif parse_cache is not None and digest is not None:
+        # Without a parser module there is no version to key on, only the manifest digest.
+        namespace, key = "input." + input.name, digest
+    with recorder.stage("parse", input=input.name) as record:
+        parsed = None
+        if key is not None:
+            parsed = parse_cache.get(namespace, key)
+        record["cached"] = parsed is not None
+        if parsed is None:
+            print("Parsing", input.name)
+            parsed = list(input.parser(pool))
+            if key is not None:
+                parse_cache.put(namespace, key, parsed)
+        record["entries"] = len(parsed)
+    return parsed, record["cached"], digest
 
-                dot = filename.rfind(".")
-                if dot >= 0:
-                    filename = filename[:dot] + ".journal"
+def convert(config, pool, manifest, parse_cache, recorder):
+    base_path = config.base_path
+    format_args = config.format
 
-                destination = os.path.join(base_path, "output", directory, filename)
-                entries[destination].append(entry)
+    entries = collections.defaultdict(entry_container(config))  # maps destination path to list of entries
+    changed_files = set()  # destination paths that have to be written, only used in incremental mode
+    # The parsers run one after another, as they may not be thread safe. convert_pipelined runs
+    # them at the same time.
+    for input in config.inputs:
+        parsed, cached, digest = parse_input(input, pool, manifest, parse_cache, recorder)
+        destinations = set()
+        for entry in parsed:
+            destination = destination_path(base_path, entry)
+            entries[destination].append(entry)
+            destinations.add(destination)
+        # Only the grouped entries are kept, e.g. in the more compact containers of compact_entries.
+        del parsed
+        if manifest is not None:
+            manifest.set_input(input.name, digest, [os.path.relpath(d, base_path) for d in destinations])
+            if not cached or manifest.input_changed(input.name, digest):
+                changed_files.update(destinations)
+    if manifest is not None and manifest.settings_changed():
+        changed_files.update(entries.keys())
 
     # Assign all entries with the known converter
-    unassigned_entries, assigned_entries, writes, output_files = assign(config.converter, format_args, entries)
+    rendered = None
+    with recorder.stage("assign", step="converter", parallel=config.parallel_assign) as record:
+        if config.parallel_assign:
+            result, rendered = assign_parallel(pool, entries)
+        else:
+            result = assign(config.converter, format_args, entries, batch_converter=config.batch_converter)
+        unassigned_entries, assigned_entries, journals, output_files = result
+        record["unassigned"] = len(unassigned_entries)
 
     # If an unassigned handler is set, pass all not-converted entries to the handler.
     # Then run assign again. It is assumed, that the unassigned handler did change the converter.
     # Therefore, this should in the best case reduce the number of unassigned entries.
+    # The handler may return the entries whose conversion it changed, e.g. only the unassigned entries if it just
+    # added new rules. Then only these are converted again, otherwise all entries are.
     if len(unassigned_entries) > 0 and config.unassigned_handler:
         print(f"Calling unassigned handler for {len(unassigned_entries)} unassigned entries.")
-        config.unassigned_handler(unassigned_entries, assigned_entries)
-        unassigned_entries, assigned_entries, writes, output_files = assign(config.converter, format_args, entries)
+        with recorder.stage("unassigned handler", entries=len(unassigned_entries)):
+            reconvert = config.unassigned_handler(unassigned_entries, assigned_entries)
+        with recorder.stage("assign", step="unassigned handler") as record:
+            if reconvert is None:
+                result = assign(config.converter, format_args, entries, batch_converter=config.batch_converter)
+                changed_files.update(entries.keys())
+            else:
+                reconvert = set(reconvert)
+                result = assign(config.converter, format_args, entries, previous=result, reconvert=reconvert, batch_converter=config.batch_converter)
+                changed_files.update(f for f, e in entries.items() if any(isinstance(entry, utils.Entry) and entry in reconvert for entry in e))
+            unassigned_entries, assigned_entries, journals, output_files = result
+            record["unassigned"] = len(unassigned_entries)
 
     # If the user wants still unassigned entries to be booked with a fallback rule this will be applied now.
     # This can be used to assign all unassigned entries to an "Unknown" account, without removing them from
     # being eligible for the unassigned handler in the next run.
+    # Assigned entries are not affected by the fallback, so only the unassigned entries are converted again.
+    # The batch converter already left them unassigned, so it is not called again.
+    if manifest is not None:
+        manifest.unassigned = len(unassigned_entries)
     if len(unassigned_entries) > 0 and config.fallback_handler:
         print(f"Calling fallback handler for {len(unassigned_entries)} unassigned entries.")
-        unassigned_entries, assigned_entries, writes, output_files = assign(lambda entry: config.converter(entry) or config.fallback_handler(entry), format_args, entries)
+        with recorder.stage("assign", step="fallback handler", entries=len(unassigned_entries)):
+            unassigned_entries, assigned_entries, journals, output_files = assign(lambda entry: config.converter(entry) or config.fallback_handler(entry), format_args, entries, previous=result, reconvert=unassigned_entries)
 
     # Finally write the output files ...
-    write(writes, output_files)
+    if manifest is not None:
+        journals = {f: j for f, j in journals.items() if f in changed_files or not os.path.exists(f)}
+    with recorder.stage("write", files=len(journals)) as record:
+        record["bytes"] = write(journals, output_files, format_args, rendered)
+    return output_files
+
+def convert_pipelined(config, pool, manifest, parse_cache, recorder):
+    """
+    Runs all parsers at the same time and converts and writes the files of an input as soon as its
+    parser is done. Only files with unassigned entries are kept until the unassigned handler ran.
+    This assumes that the unassigned handler only adds rules for unassigned entries, like the TUI
+    does, and that every output file is produced by a single input.
+    """
+    base_path = config.base_path
+    format_args = config.format
+    new_entries = entry_container(config)
+    settings_changed = manifest is not None and manifest.settings_changed()
+
+    output_files = dict()  # maps input name to its destination paths and their dates, in the order of the batch mode
+    owners = dict()  # maps destination path to the name of the input producing it
+    pending = dict()  # maps destination path to the entries of files waiting for the unassigned handler
+    unassigned_entries = []
+    assigned_entries = {}
+    fallback_count = 0
+    left_unassigned = 0  # entries still unassigned after the unassigned handler
+    written_bytes = collections.Counter()  # maps input name to bytes written
 
-    # ... and the root journal referencing all output files.
-    for file, date in output_files.items():
-        all_output_files[file] = date
-    with open(os.path.join(base_path, "output", "root.journal"), "w", encoding="UTF-8") as fp:
-        for output_file, date in sorted(all_output_files.items(), key=lambda i: i[1]):
-            output_file = output_file[output_file.index("output") + 7:]
-            fp.write("include " + output_file + "\n")
+    def finish_file(destination, file_entries, changed, result):
+        nonlocal fallback_count, left_unassigned
+        unassigned, assigned, journals, dates = result
+        left_unassigned += len(unassigned)
+        if len(unassigned) > 0 and config.fallback_handler:
+            fallback_count += len(unassigned)
+            unassigned, assigned, journals, dates = assign(lambda entry: config.converter(entry) or config.fallback_handler(entry), format_args, {destination: file_entries}, previous=result, reconvert=unassigned)
+        if changed or not os.path.exists(destination):
+            written_bytes[owners[destination]] += write(journals, dates, format_args)
+        output_files[owners[destination]].update(dates)
+        return unassigned, assigned
 
+    # Forking the worker processes while the parser threads run could deadlock them, e.g. on a lock
+    # held by another thread, so they are started before.
+    pool.start()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(len(config.inputs), 1)) as executor:
+        futures = {executor.submit(parse_input, input, pool, manifest, parse_cache, recorder): input for input in config.inputs}
+        for future in concurrent.futures.as_completed(futures):
+            input = futures.pop(future)
+            parsed, cached, digest = future.result()
+            del future
+            entries = collections.defaultdict(new_entries)
+            for entry in parsed:
+                entries[destination_path(base_path, entry)].append(entry)
+            del parsed
+            output_files[input.name] = dict.fromkeys(entries)
+            changed = True
+            if manifest is not None:
+                manifest.set_input(input.name, digest, [os.path.relpath(d, base_path) for d in entries])
+                changed = settings_changed or not cached or manifest.input_changed(input.name, digest)
+
+            with recorder.stage("convert", input=input.name, files=len(entries)) as record:
+                for destination, file_entries in entries.items():
+                    if destination in owners:
+                        raise Exception(f"{destination} is produced by {owners[destination]} and {input.name}, this is not supported in pipeline mode")
+                    owners[destination] = input.name
+                    result = assign(config.converter, format_args, {destination: file_entries}, batch_converter=config.batch_converter)
+                    if len(result[0]) > 0 and config.unassigned_handler:
+                        pending[destination] = (file_entries, result)
+                        unassigned_entries += result[0]
+                        assigned_entries.update(result[1])
+                        continue
+                    unassigned, assigned = finish_file(destination, file_entries, changed, result)
+                    unassigned_entries += unassigned
+                    if config.unassigned_handler:
+                        assigned_entries.update(assigned)
+                record["bytes"] = written_bytes[input.name]
+            del entries
+
+    reconvert = None
+    if len(unassigned_entries) > 0 and config.unassigned_handler:
+        print(f"Calling unassigned handler for {len(unassigned_entries)} unassigned entries.")
+        with recorder.stage("unassigned handler", entries=len(unassigned_entries)):
+            reconvert = config.unassigned_handler(unassigned_entries, assigned_entries)
+    with recorder.stage("convert", step="unassigned handler", files=len(pending)):
+        for destination, (file_entries, result) in pending.items():
+            if reconvert is None:
+                result = assign(config.converter, format_args, {destination: file_entries}, batch_converter=config.batch_converter)
+            else:
+                result = assign(config.converter, format_args, {destination: file_entries}, previous=result, reconvert=reconvert, batch_converter=config.batch_converter)
+            finish_file(destination, file_entries, True, result)
+
+    if fallback_count > 0:
+        print(f"Called fallback handler for {fallback_count} unassigned entries.")
+    if manifest is not None:
+        manifest.unassigned = left_unassigned
+    return {file: date for input in config.inputs for file, date in output_files.get(input.name, dict()).items()}
+
+def write(journals, file_order, format_args, rendered=None):
+    """
+    Writes the journals and returns the number of bytes written. rendered may map destination
+    files to a journal and its text, which is used if the journal to write is still the same.
+    """
+    written_bytes = 0
+    for dest_file, journal in sorted(journals.items(), key=lambda e: file_order[e[0]]):
+        cached = rendered.get(dest_file) if rendered is not None else None
+        text = cached[1] if cached is not None and cached[0] is journal else utils.render_journal(journal, format_args)
+        written_bytes += write_file(dest_file, text)
+    return written_bytes
+
+# The umask can only be read by setting it, which is not thread safe, so it is read once at import.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def write_file(path, text):
+    # Write to a temporary file first, so that an interrupted run never leaves a half written journal.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="UTF-8") as fp:
+            fp.write(text)
+        # mkstemp creates the file readable by the owner only, keep the mode open() would give it.
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return os.stat(path).st_size
+
+def write_root_journal(base_path, output_files):
+    root = []
+    for output_file, date in sorted(output_files.items(), key=lambda i: i[1]):
+        output_file = output_file[output_file.index("output") + 7:]
+        root.append("include " + output_file + "\n")
+    return write_file(os.path.join(base_path, "output", "root.journal"), "".join(root))
+
+def main(config):
+    base_path = config.base_path
+    format_args = config.format
+    recorder = instrument.Recorder()
+    if getattr(config.converter, "needs_every_entry", False) and (config.parallel_assign or config.signature is not None):
+        # E.g. the TUI converter reordering its rules, which would only see some of the entries
+        raise Exception("The converter has to be called for every entry, which is not the case with parallel_assign or signature")
+    profiled_converter = None
+    if config.profile_converter:
+        profiled_converter = instrument.ProfiledConverter(config.converter)
+        config = dataclasses.replace(config, converter=profiled_converter)
+    memoized_converter = None
+    if config.signature is not None:
+        memoized_converter = memo.MemoizedConverter(config.converter, config.signature)
+        config = dataclasses.replace(config, converter=memoized_converter)
+        if config.unassigned_handler is not None:
+            # The handler changes the rules, so the results of the converter are outdated afterwards.
+            unassigned_handler = config.unassigned_handler
+            def cleared_handler(unassigned, assigned):
+                try:
+                    return unassigned_handler(unassigned, assigned)
+                finally:
+                    memoized_converter.clear()
+            config = dataclasses.replace(config, unassigned_handler=cleared_handler)
+
+    should_fetch_commodity_prices = True
+    prices_path_rel = os.path.join("output", "prices.journal")
+    prices_path = os.path.join(base_path, prices_path_rel)
+    price_store = prices.PriceStore(incremental.cache_path(base_path, "prices.sqlite"))
+    if os.path.exists(prices_path):
+        # Prices from before the price store existed, or after the cache has been deleted
+        if price_store.empty():
+            price_store.merge(hledger.Scanner().prices(prices_path))
+
+        mtime = datetime.datetime.fromtimestamp(os.stat(prices_path).st_mtime)
+        should_fetch_commodity_prices = datetime.datetime.now() - mtime > datetime.timedelta(days=2)
+
+    manifest = None
+    parse_cache = None
+    if config.incremental or config.parse_cache:
+        parse_cache = cache.parse_cache(base_path, config.parse_cache_max_bytes)
+    if config.incremental:
+        manifest = incremental.Manifest(base_path)
+        os.makedirs(os.path.join(base_path, "output"), exist_ok=True)
+    else:
+        delete_output(base_path)
+    all_output_files = dict()
+    
+    with recorder.stage("prices", fetched=should_fetch_commodity_prices):
+        if should_fetch_commodity_prices:
+            fetch_commodity_prices(config, price_store)
+        if should_fetch_commodity_prices or not os.path.exists(prices_path):
+            write_file(prices_path, price_store.render())
+    price_store.close()
+    all_output_files[prices_path_rel] = datetime.date(1000, 1, 1)
+
+    # Nothing to do if no input, no rule and no setting changed since the last run, which left
+    # nothing to the unassigned handler. This does not even start the worker processes.
+    tasks = None
+    if manifest is not None and manifest.unchanged([input.name for input in config.inputs]):
+        print("Nothing changed since the last run")
+    else:
+        initializer, initargs = None, ()
+        if config.parallel_assign:
+            initializer, initargs = init_assign_worker, (config.converter, config.batch_converter, format_args)
+        # Parsers get the scheduler as pool. Its worker processes are only started once a task is submitted.
+        with scheduler.Scheduler(initializer=initializer, initargs=initargs, timeout=config.task_timeout) as pool:
+            if config.pipeline:
+                output_files = convert_pipelined(config, pool, manifest, parse_cache, recorder)
+            else:
+                output_files = convert(config, pool, manifest, parse_cache, recorder)
+        tasks = pool.progress()
+
+        if manifest is not None:
+            for stale in manifest.stale_outputs():
+                stale = os.path.join(base_path, stale)
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+        # Finally the root journal referencing all output files.
+        for file, date in output_files.items():
+            all_output_files[file] = date
+        with recorder.stage("root.journal", files=len(all_output_files)) as record:
+            record["bytes"] = write_root_journal(base_path, all_output_files)
+
+    if manifest is not None:
+        manifest.save()
+
+    if profiled_converter is not None:
+        profiled_converter.dump(os.path.join(base_path, "output", "converter.prof"))
+    if memoized_converter is not None and memoized_converter.hits + memoized_converter.calls > 0:
+        summary = memoized_converter.summary()
+        print(f"Converter memo: {summary['hits']} hits, {summary['calls']} calls, {summary['hit_rate']:.0%} hit rate")
+    if config.report:
+        extra = dict(converter_profile=profiled_converter.top()) if profiled_converter is not None else dict()
+        if memoized_converter is not None:
+            extra["converter_memo"] = memoized_converter.summary()
+        if tasks is not None:
+            extra["tasks"] = tasks._asdict()
+        recorder.write(os.path.join(base_path, "output", "report.json"), **extra)
+
+def fetch_commodity_prices(config, price_store):
+    base_path = config.base_path
+    format_args = config.format
+    print("Fetching prices")
+    alphavantage_api_key = config.prices.alphavantage_key
+    equity_entries = [{'type': 'EQUITY', 'key': v[0], 'symbol': v[1], 'currency': v[2]} for v in config.prices.equities]
+    fx_entries = [{'type': 'FX', 'from_symbol': v[0], 'to_symbol': v[1]} for v in config.prices.forex]
+    # The fetch cache is only valid as long as the prices it refers to are still there.
+    fetch_cache_path = incremental.cache_path(base_path, "prices.json")
+    if price_store.empty() and os.path.exists(fetch_cache_path):
+        os.remove(fetch_cache_path)
+    new_commodity_prices = fetch_prices.fetch(alphavantage_api_key, equity_entries + fx_entries, format_args, cache_path=fetch_cache_path, requests_per_minute=config.prices.requests_per_minute)
+    price_store.merge(prices.parse_journal(new_commodity_prices))
 
 def merge_prices(existing_prices, new_prices):
     parse_prices = lambda rows:  [r.split(' ') for r in rows.splitlines()]
@@ -0,0 +1,148 @@
+from .rules.data import Booking, BookingLine
+from .utils import sanitize_description
+
+# Placeholders in templates for the values of the entry being converted
+TEXT, SANITIZED_TEXT, ACCOUNT, AMOUNT, NEGATED_AMOUNT, CURRENCY = (object() for _ in range(6))
+
+class MemoizedConverter:
+    """
+    Wraps a converter and calls it only once per signature of the entries. signature returns a
+    hashable value for an entry, e.g. its account and normalized text, or None if the entry must
+    always be converted. All entries with the same signature must be converted alike: the booking
+    of the first one is kept as template, in which the date, text, account, amount and currency
+    of the entry are replaced by the ones of the following entries. Other values, e.g. destination
+    accounts, are taken as they are. Unassigned entries are remembered as well.
+
+    The text is also replaced where the description contains it, e.g. the TUI appends the rule
+    number to it. As the description may as well be a constant that happens to contain the text,
+    such a template is only used for other texts once the converter booked an entry with another
+    text the same way. Bookings that cannot be expressed as template, i.e., with another date, with
+    amounts other than the amount of the entry or its negation, or with a description derived
+    from the text in another way, are not remembered.
+
+    The remembered results have to be cleared whenever the converter changes, e.g. after the TUI
+    added rules.
+    """
+    def __init__(self, converter, signature):
+        self.converter = converter
+        self.signature = signature
+        self.hits = 0
+        self.calls = 0
+        self._templates = dict()
+        # Templates with the text in their description and the text they were made from, until
+        # an entry with another text confirmed them
+        self._unconfirmed = dict()
+
+    def __call__(self, entry):
+        key = self.signature(entry)
+        if key is None:
+            self.calls += 1
+            return self.converter(entry)
+        if key in self._templates:
+            template = self._templates[key]
+            if template is not _UNCACHEABLE:
+                self.hits += 1
+                return instantiate(template, entry) if template is not None else None
+        elif key in self._unconfirmed:
+            template, text = self._unconfirmed[key]
+            if entry.text == text:
+                self.hits += 1
+                return instantiate(template, entry)
+            self.calls += 1
+            booking = self.converter(entry)
+            del self._unconfirmed[key]
+            self._templates[key] = template if booking == instantiate(template, entry) else _UNCACHEABLE
+            return booking
+        self.calls += 1
+        booking = self.converter(entry)
+        if key not in self._templates:
+            template = make_template(booking, entry)
+            if template is not None and template is not _UNCACHEABLE and any(part in (TEXT, SANITIZED_TEXT) for part in template[0]):
+                self._unconfirmed[key] = (template, entry.text)
+            else:
+                self._templates[key] = template
+        return booking
+
+    def clear(self):
+        self._templates.clear()
+        self._unconfirmed.clear()
+
+    def summary(self):
+        total = self.hits + self.calls
+        rate = self.hits / total if total > 0 else 0
+        return dict(hits=self.hits, calls=self.calls, signatures=len(self._templates) + len(self._unconfirmed), hit_rate=rate)
+
+# Template of signatures whose bookings cannot be reused
+_UNCACHEABLE = object()
+
+def _same(value, other):
+    return type(value) is type(other) and value == other
+
+def make_template(booking, entry):
+    """
+    Returns the template of the booking of an entry for instantiate, None for no booking or
+    _UNCACHEABLE.
+    """
+    if booking is None:
+        return None
+    if type(booking) is not Booking or not _same(booking.date, entry.date) or not isinstance(booking.lines, (list, tuple)):
+        return _UNCACHEABLE
+    lines = []
+    for line in booking.lines:
+        if type(line) is not BookingLine:
+            return _UNCACHEABLE
+        if line.amount is None:
+            amount = None
+        elif _same(line.amount, entry.amount):
+            amount = AMOUNT
+        elif _same(line.amount, -entry.amount):
+            amount = NEGATED_AMOUNT
+        else:
+            return _UNCACHEABLE
+        # Commodities with an exchange value contain an amount as well.
+        if isinstance(line.commodity, tuple):
+            return _UNCACHEABLE
+        account = ACCOUNT if line.account == entry.account else line.account
+        commodity = CURRENCY if line.commodity is not None and line.commodity == entry.currency else line.commodity
+        lines.append((account, amount, commodity))
+    description = _description_template(booking.description, entry.text)
+    if description is _UNCACHEABLE:
+        return _UNCACHEABLE
+    return description, lines
+
+def _description_template(description, text):
+    """
+    Returns the description as list of strings and text placeholders, or _UNCACHEABLE if it is
+    derived from the text in another way, e.g. truncated.
+    """
+    if type(description) is not str or type(text) is not str:
+        return [description] if description != text else [TEXT]
+    for value, placeholder in ((text, TEXT), (sanitize_description(text), SANITIZED_TEXT)):
+        if value and value in description:
+            parts = description.split(value)
+            template = [parts[0]]
+            for part in parts[1:]:
+                template += [placeholder, part]
+            return [p for p in template if p != ""]
+    # The TUI, for example, appends the rule number to the text. Any word of the text in the
+    # description means that it depends on the text, but not in a way it can be replaced.
+    if any(len(word) >= 3 and word in description for word in text.split()):
+        return _UNCACHEABLE
+    return [description]
+
+def instantiate(template, entry):
+    description, lines = template
+    values = {TEXT: entry.text, ACCOUNT: entry.account, CURRENCY: entry.currency}
+    if SANITIZED_TEXT in description:
+        values[SANITIZED_TEXT] = sanitize_description(entry.text)
+    amounts = {None: None, AMOUNT: entry.amount}
+    if any(amount is NEGATED_AMOUNT for _, amount, _ in lines):
+        amounts[NEGATED_AMOUNT] = -entry.amount
+    if len(description) == 1:
+        description = values.get(description[0], description[0])
+    else:
+        description = "".join(values.get(part, part) for part in description)
+    return Booking(date=entry.date, description=description, lines=[
+        BookingLine(account=values.get(account, account), amount=amounts[amount], commodity=values.get(commodity, commodity))
+        for account, amount, commodity in lines
+    ])
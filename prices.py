@@ -0,0 +1,75 @@
+import os
+import sqlite3
+
+from .utils import escape_commodity, parse_num_str
+
+def parse_journal(text):
+    """
+    Returns the (date, commodity, price, currency) tuples of the P directives in a prices journal.
+    """
+    rows = []
+    for line in text.splitlines():
+        if line.strip():
+            _p, date, commodity, price, currency = line.split(' ')
+            rows.append((date, commodity, price, currency))
+    return rows
+
+class PriceStore:
+    """
+    Prices stored in SQLite with (commodity, currency, date) as primary key. Commodities and
+    currencies are stored as they appear in the journal, i.e., escaped, and prices as formatted,
+    so that rendering reproduces the journal exactly.
+    """
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS prices (
+                commodity TEXT NOT NULL,
+                currency TEXT NOT NULL,
+                date TEXT NOT NULL,
+                price TEXT NOT NULL,
+                PRIMARY KEY (commodity, currency, date)
+            ) WITHOUT ROWID
+        """)
+
+    def close(self):
+        self._db.close()
+
+    def empty(self):
+        return self._db.execute("SELECT 1 FROM prices LIMIT 1").fetchone() is None
+
+    def merge(self, rows):
+        """
+        Inserts or updates (date, commodity, price, currency) rows. Only the given rows are touched.
+        """
+        with self._db:
+            for date, commodity, price, currency in rows:
+                existing = self._db.execute(
+                    "SELECT price FROM prices WHERE commodity = ? AND currency = ? AND date = ?", (commodity, currency, date)
+                ).fetchone()
+                if existing is not None and existing[0] != price:
+                    # Alphavantage reports the current day and the value can, of course, vary
+                    print(f'Warn: Merging prices - duplicate key {(date, commodity, currency)} with mismatched value ({price} vs {existing[0]})')
+                self._db.execute(
+                    "INSERT INTO prices (commodity, currency, date, price) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (commodity, currency, date) DO UPDATE SET price = excluded.price",
+                    (commodity, currency, date, price)
+                )
+
+    def price(self, commodity, currency, date, format_args):
+        """
+        Returns the latest price of commodity in currency on or before date as Fraction, or None.
+        """
+        row = self._db.execute(
+            "SELECT price FROM prices WHERE commodity = ? AND currency = ? AND date <= ? ORDER BY date DESC LIMIT 1",
+            (escape_commodity(commodity), escape_commodity(currency), str(date))
+        ).fetchone()
+        return None if row is None else parse_num_str(row[0], format_args.decimal_separator)
+
+    def render(self):
+        """
+        Returns the prices as hledger journal of P directives, ordered by date, commodity and currency.
+        """
+        cursor = self._db.execute("SELECT date, commodity, price, currency FROM prices ORDER BY date, commodity, currency")
+        return '\n'.join(f"P {date} {commodity} {price} {currency}" for date, commodity, price, currency in cursor)
@@ -5,6 +5,25 @@ import os
 import sys
 
 def read_rules(rules_path):
+    return read_rules_module(rules_path).make_converter()
+
+def read_batch_converter(module):
+    """
+    Returns the batch converter of a rules module (see main.Config.batch_converter), or None if the
+    module does not define make_batch_converter.
+    """
+    make_batch_converter = getattr(module, "make_batch_converter", None)
+    return make_batch_converter() if make_batch_converter is not None else None
+
+def read_signature(module):
+    """
+    Returns the signature function of a rules module (see main.Config.signature), or None if the
+    module does not define make_signature.
+    """
+    make_signature = getattr(module, "make_signature", None)
+    return make_signature() if make_signature is not None else None
+
+def read_rules_module(rules_path):
     module_name = 'rules.user'
     # We have to add the rules directory to the python path to allow for simple submodule imports in the rules module
     syspath = [rules_path] + sys.path
@@ -13,7 +32,7 @@ def read_rules(rules_path):
         module = importlib.util.module_from_spec(spec)
         spec.loader.exec_module(module)
 
-    return module.make_converter()
+    return module
 
 
 @contextlib.contextmanager
@@ -1,6 +1,9 @@
 import collections
+import functools
 import hashlib
 import json
+import re
+from json.encoder import encode_basestring_ascii
 
 Booking = collections.namedtuple("Booking", ("date", "description", "lines"))
 BookingLine = collections.namedtuple("BookingLine", ("account", "amount", "commodity"))
@@ -9,7 +12,47 @@ def assert_is_booking(booking):
     if booking is not None:
         assert type(booking) is Booking, f'Expected Booking, but got {type(booking)} with value {booking}'
 
+def match_rules(batch, rules):
+    """
+    Helper for batch converters: returns, for every entry of the batch, the destination account of
+    the first (pattern, account, dest_account) rule whose pattern is found in the text and whose
+    account is None or the account of the entry, or None. Every distinct account and text is only
+    matched once.
+    """
+    rules = [(re.compile(pattern), account, dest_account) for pattern, account, dest_account in rules]
+    matched = dict()
+    result = []
+    for account, text in zip(batch.column("account"), batch.column("text")):
+        key = (account, text)
+        if key not in matched:
+            matched[key] = None
+            if text is not None:
+                for pattern, rule_account, dest_account in rules:
+                    if (rule_account is None or rule_account == account) and pattern.search(text):
+                        matched[key] = dest_account
+                        break
+        result.append(matched[key])
+    return result
+
 def entry_id(entry):
+    if type(entry.text) is str and type(entry.currency) is str:
+        # Keyed by the serialized fields: amounts that are equal, e.g. Decimal("1.5") and
+        # Decimal("1.50"), are printed differently and have different ids.
+        return _entry_id_cached(f'{entry.date}', entry.text, f'{entry.amount}', entry.currency)
+    return _entry_id(entry)
+
+@functools.lru_cache(maxsize=1 << 16)
+def _entry_id_cached(date, text, amount, currency):
+    # Same as the json.dumps below, without building the dict and running the generic encoder
+    entry_str = (
+        '{"date": ' + encode_basestring_ascii(date) +
+        ', "text": ' + encode_basestring_ascii(text) +
+        ', "amount": ' + encode_basestring_ascii(amount) +
+        ', "currency": ' + encode_basestring_ascii(currency) + '}'
+    )
+    return hashlib.sha256(entry_str.encode('utf-8')).hexdigest()[:8]
+
+def _entry_id(entry):
     entry_str = json.dumps({
         # account and source have been intentionally excluded as they are probably too unstable
         'date': f'{entry.date}',
@@ -18,4 +61,4 @@ def entry_id(entry):
         'currency': entry.currency,
 
     })
-    return hashlib.sha256(entry_str.encode('utf-8')).hexdigest()[:8]
\ No newline at end of file
+    return hashlib.sha256(entry_str.encode('utf-8')).hexdigest()[:8]
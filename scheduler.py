@@ -0,0 +1,162 @@
+import collections
+import concurrent.futures
+import multiprocessing
+import signal
+import threading
+
+Progress = collections.namedtuple("Progress", ("submitted", "completed", "failed", "timed_out"))
+
+class Scheduler:
+    """
+    Runs the tasks of all parsers in one process pool, which is only started when the first task
+    is submitted or start is called. Idle workers take the next task from the queue shared by all
+    inputs, so when parsers run at the same time, e.g. in pipeline mode, a long document of one
+    input does not hold back the others as long as the parsers submit a task per file instead of
+    one task for all of them.
+
+    The workers are forked on Unix, so with parsers running in threads, start has to be called
+    before the threads are started.
+
+    Besides submit, stream and as_completed, it supports the methods of multiprocessing.Pool that
+    parsers use, so it can be passed as pool.
+
+    Tasks submitted with a timeout raise TimeoutError in the worker when they run longer, which
+    also interrupts waiting for a subprocess, e.g. poppler or an OCR tool. If the task does not
+    react, e.g. inside a C extension, its future still fails with TimeoutError shortly after, but
+    the worker stays busy until the task returns.
+    """
+    def __init__(self, processes=None, initializer=None, initargs=(), timeout=None):
+        self.processes = processes
+        self.initializer = initializer
+        self.initargs = initargs
+        # Default timeout in seconds for submit and stream
+        self.timeout = timeout
+        self._pool = None
+        self._lock = threading.Lock()
+        self._counts = collections.Counter()
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(self.processes, initializer=self.initializer, initargs=self.initargs)
+            return self._pool
+
+    def start(self):
+        """
+        Starts the worker processes now instead of when the first task is submitted.
+        """
+        self.pool
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.terminate()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+
+    def join(self):
+        if self._pool is not None:
+            self._pool.join()
+
+    def terminate(self):
+        if self._pool is not None:
+            self._pool.terminate()
+
+    def progress(self):
+        with self._lock:
+            return Progress(*(self._counts[field] for field in Progress._fields))
+
+    def _count(self, field):
+        with self._lock:
+            self._counts[field] += 1
+
+    def submit(self, fn, *args, timeout=None, **kwargs):
+        """
+        Runs fn(*args, **kwargs) in a worker and returns a concurrent.futures.Future of its result.
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+        self._count("submitted")
+
+        def resolve(result=None, exception=None):
+            # The first of the result and the timer wins.
+            try:
+                if exception is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(exception)
+            except concurrent.futures.InvalidStateError:
+                return
+            self._count("completed" if exception is None else "timed_out" if isinstance(exception, TimeoutError) else "failed")
+
+        if timeout is not None:
+            timer = threading.Timer(timeout + TIMEOUT_GRACE, lambda: resolve(exception=TimeoutError(f"Task did not finish within {timeout}s")))
+            timer.daemon = True
+            timer.start()
+            future.add_done_callback(lambda _: timer.cancel())
+        self.pool.apply_async(
+            _run, (fn, args, kwargs, timeout),
+            callback=lambda result: resolve(result=result),
+            error_callback=lambda exception: resolve(exception=exception),
+        )
+        return future
+
+    def stream(self, fn, items, timeout=None):
+        """
+        Submits fn(item) for every item and yields (item, future) as soon as each future is done.
+        """
+        futures = {self.submit(fn, item, timeout=timeout): item for item in items}
+        for future in concurrent.futures.as_completed(futures):
+            yield futures[future], future
+
+    @staticmethod
+    def as_completed(futures, timeout=None):
+        return concurrent.futures.as_completed(futures, timeout)
+
+    # The interface of multiprocessing.Pool
+
+    def apply(self, func, args=(), kwds={}):
+        return self.pool.apply(func, args, kwds)
+
+    def apply_async(self, func, args=(), kwds={}, callback=None, error_callback=None):
+        return self.pool.apply_async(func, args, kwds, callback, error_callback)
+
+    def map(self, func, iterable, chunksize=None):
+        return self.pool.map(func, iterable, chunksize)
+
+    def map_async(self, func, iterable, chunksize=None, callback=None, error_callback=None):
+        return self.pool.map_async(func, iterable, chunksize, callback, error_callback)
+
+    def imap(self, func, iterable, chunksize=1):
+        return self.pool.imap(func, iterable, chunksize)
+
+    def imap_unordered(self, func, iterable, chunksize=1):
+        return self.pool.imap_unordered(func, iterable, chunksize)
+
+    def starmap(self, func, iterable, chunksize=None):
+        return self.pool.starmap(func, iterable, chunksize)
+
+    def starmap_async(self, func, iterable, chunksize=None, callback=None, error_callback=None):
+        return self.pool.starmap_async(func, iterable, chunksize, callback, error_callback)
+
+# Time the parent process waits for a task after its timeout before giving up on it
+TIMEOUT_GRACE = 5
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError("Task timed out")
+
+def _run(fn, args, kwargs, timeout):
+    if timeout is None or not hasattr(signal, "setitimer"):
+        return fn(*args, **kwargs)
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
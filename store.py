@@ -0,0 +1,233 @@
+import array
+import datetime
+import functools
+from fractions import Fraction
+
+from .utils import Entry, Assert, Money, decimal_scale
+
+# Kinds of rows. Everything that does not fit into the columns, e.g. Raw entries, is kept as object.
+ENTRY, ASSERT, OBJECT = 0, 1, 2
+# Scale of amounts that are ints, i.e., cents, as opposed to Fractions with a scale of 0 or more.
+INT_SCALE = -1
+MAX_SCALE = 18
+# Scales of Money amounts are stored offset by this.
+MONEY_SCALE = 32
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+# Fields of interned strings and the arrays of their indices
+STRING_COLUMNS = {"source": "sources", "account": "accounts", "currency": "currencies"}
+# Fields accepted by EntryStore.column
+COLUMNS = ("source", "account", "date", "text", "amount", "currency")
+
+class StringTable:
+    """
+    Interns strings and maps them to ints. Can be shared between several stores.
+    """
+    def __init__(self):
+        self.values = []
+        self._index = dict()
+
+    def __len__(self):
+        return len(self.values)
+
+    def intern(self, value):
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def __getstate__(self):
+        # The index is rebuilt from the values, which halves the size of the pickle.
+        return {"values": self.values}
+
+    def __setstate__(self, state):
+        self.values = state["values"]
+        self._index = {value: i for i, value in enumerate(self.values)}
+
+class EntryStore:
+    """
+    Column oriented storage of utils.Entry and utils.Assert tuples. Dates are stored as ordinals,
+    amounts as int64 with a decimal scale where that is exact, sources, accounts and currencies as
+    indices into a string table and texts UTF-8 encoded in one buffer. Anything else is stored as
+    it is.
+
+    Behaves like a list of entries: iterating and indexing return namedtuples equal to the ones
+    appended.
+    """
+    def __init__(self, strings=None, entries=()):
+        self.strings = strings if strings is not None else StringTable()
+        self.kinds = array.array("b")
+        self.dates = array.array("i")
+        self.sources = array.array("i")
+        self.accounts = array.array("i")
+        # Texts are mostly unique, so they are not interned but stored UTF-8 encoded one after another.
+        self.text_bytes = bytearray()
+        self.text_ends = array.array("q")
+        self.amounts = array.array("q")
+        self.scales = array.array("b")
+        self.currencies = array.array("i")
+        self.objects = []
+        self.extend(entries)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self):
+        values = self.strings.values
+        text_bytes = self.text_bytes
+        columns = zip(self.kinds, self.dates, self.sources, self.accounts, self.text_ends, self.amounts, self.scales, self.currencies)
+        text_start = 0
+        for kind, date, source, account, text_end, amount, scale, currency in columns:
+            if kind == OBJECT:
+                yield self.objects[amount]
+                continue
+            date = _date(date)
+            amount = amount if scale == INT_SCALE else _decode_amount(amount, scale)
+            if kind == ENTRY:
+                yield Entry(values[source], values[account], date, text_bytes[text_start:text_end].decode("utf-8"), amount, values[currency])
+                text_start = text_end
+            else:
+                yield Assert(values[source], values[account], date, amount, values[currency])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return EntryStore(self.strings, (self[j] for j in range(*i.indices(len(self)))))
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("EntryStore index out of range")
+        kind = self.kinds[i]
+        if kind == OBJECT:
+            return self.objects[self.amounts[i]]
+        values = self.strings.values
+        date = _date(self.dates[i])
+        amount = self._amount(i)
+        if kind == ENTRY:
+            return Entry(values[self.sources[i]], values[self.accounts[i]], date, self._text(i), amount, values[self.currencies[i]])
+        return Assert(values[self.sources[i]], values[self.accounts[i]], date, amount, values[self.currencies[i]])
+
+    def __getstate__(self):
+        # The string table is usually shared by all stores of a run, e.g. with compact_entries. A
+        # pickled store, e.g. sent to a worker process, only takes the strings it uses along.
+        state = self.__dict__.copy()
+        strings = StringTable()
+        values = self.strings.values
+        for name in STRING_COLUMNS.values():
+            state[name] = array.array("i", (strings.intern(values[index]) if kind != OBJECT else 0 for index, kind in zip(getattr(self, name), self.kinds)))
+        state["strings"] = strings
+        return state
+
+    def _amount(self, i):
+        return _decode_amount(self.amounts[i], self.scales[i])
+
+    def _text(self, i):
+        start = self.text_ends[i - 1] if i > 0 else 0
+        return self.text_bytes[start:self.text_ends[i]].decode("utf-8")
+
+    def append(self, entry):
+        kind = _kind(entry)
+        amount = _encode_amount(entry.amount) if kind != OBJECT else None
+        if amount is None:
+            self.kinds.append(OBJECT)
+            self.amounts.append(len(self.objects))
+            self.scales.append(0)
+            self.objects.append(entry)
+            for column in (self.dates, self.sources, self.accounts, self.currencies):
+                column.append(0)
+            self.text_ends.append(len(self.text_bytes))
+            return
+        intern = self.strings.intern
+        self.kinds.append(kind)
+        self.amounts.append(amount[0])
+        self.scales.append(amount[1])
+        self.dates.append(entry.date.toordinal())
+        self.sources.append(intern(entry.source))
+        self.accounts.append(intern(entry.account))
+        if kind == ENTRY:
+            self.text_bytes += entry.text.encode("utf-8")
+        self.text_ends.append(len(self.text_bytes))
+        self.currencies.append(intern(entry.currency))
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def column(self, name):
+        """
+        Returns the values of a field for all rows as list, None for rows without that field, e.g.
+        the text of an Assert. Entries stored as object, e.g. with a Decimal amount, have their
+        fields as well.
+        """
+        if name not in COLUMNS:
+            raise KeyError(f"Unknown column {name!r}, expected one of {', '.join(COLUMNS)}")
+        if name == "amount":
+            values = [self._amount(i) if kind != OBJECT else None for i, kind in enumerate(self.kinds)]
+        elif name == "date":
+            values = [_date(d) if kind != OBJECT else None for d, kind in zip(self.dates, self.kinds)]
+        elif name == "text":
+            values = [self._text(i) if kind == ENTRY else None for i, kind in enumerate(self.kinds)]
+        else:
+            strings = self.strings.values
+            values = [strings[index] if kind != OBJECT else None for index, kind in zip(getattr(self, STRING_COLUMNS[name]), self.kinds)]
+        for i, kind in enumerate(self.kinds):
+            if kind == OBJECT:
+                row = self.objects[self.amounts[i]]
+                if isinstance(row, (Entry, Assert)):
+                    values[i] = getattr(row, name, None)
+        return values
+
+def _kind(entry):
+    # Subclasses, other date types, e.g. datetime, or commodities with an exchange value could not be
+    # restored exactly from the columns.
+    if type(entry) is Entry:
+        if type(entry.text) is not str:
+            return OBJECT
+        kind, strings = ENTRY, (entry.source, entry.account, entry.currency)
+    elif type(entry) is Assert:
+        kind, strings = ASSERT, (entry.source, entry.account, entry.currency)
+    else:
+        return OBJECT
+    if type(entry.date) is not datetime.date or not all(s is None or type(s) is str for s in strings):
+        return OBJECT
+    return kind
+
+# Statements repeat amounts and dates a lot, so restored values are shared.
+@functools.lru_cache(maxsize=1 << 16)
+def _fraction(mantissa, scale):
+    return Fraction(mantissa, 10 ** scale)
+
+@functools.lru_cache(maxsize=1 << 16)
+def _money(mantissa, scale):
+    return Money(mantissa, scale)
+
+def _decode_amount(mantissa, scale):
+    if scale == INT_SCALE:
+        return mantissa
+    if scale >= MONEY_SCALE:
+        return _money(mantissa, scale - MONEY_SCALE)
+    return _fraction(mantissa, scale)
+
+@functools.lru_cache(maxsize=1 << 14)
+def _date(ordinal):
+    return datetime.date.fromordinal(ordinal)
+
+def _encode_amount(amount):
+    """
+    Returns (mantissa, scale) for ints and decimal Fractions and Money fitting into int64,
+    otherwise None.
+    """
+    if type(amount) is int:
+        mantissa, scale = amount, INT_SCALE
+    elif type(amount) is Money:
+        if amount.mantissa is None or amount.scale > MAX_SCALE:
+            return None
+        mantissa, scale = amount.mantissa, amount.scale + MONEY_SCALE
+    elif type(amount) is Fraction:
+        mantissa, scale = decimal_scale(amount)
+        if mantissa is None or scale > MAX_SCALE:
+            return None
+    else:
+        return None
+    if not INT64_MIN <= mantissa <= INT64_MAX:
+        return None
+    return mantissa, scale
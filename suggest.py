@@ -0,0 +1,85 @@
+import collections
+import heapq
+import math
+
+from thefuzz import process
+
+class SuggestionIndex:
+    """
+    Trigram index over strings for fuzzy lookups. Only the strings sharing the most trigrams with
+    the query are scored with thefuzz, so the time per lookup does not grow with the number of
+    strings as long as the trigrams are selective. Strings can be added at any time.
+
+    With sort_keys, equal scores are returned in the order of the strings instead of the order
+    they were added, as if every string had been inserted at its sorted position.
+    """
+    def __init__(self, keys=(), shortlist=200, max_postings=5000, sort_keys=False, min_query_length=4):
+        self.keys = []
+        self.shortlist = shortlist
+        self.sort_keys = sort_keys
+        # Shorter queries share too few trigrams with the strings they match, so all strings are scored.
+        self.min_query_length = min_query_length
+        # Trigrams occurring in more strings than this are too common to narrow down the candidates.
+        self.max_postings = max_postings
+        self._ids = dict()
+        self._postings = collections.defaultdict(list)
+        for key in keys:
+            self.add(key)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def add(self, key):
+        if key in self._ids:
+            return
+        id = self._ids[key] = len(self.keys)
+        self.keys.append(key)
+        for trigram in trigrams(key):
+            self._postings[trigram].append(id)
+
+    def candidates(self, query):
+        """
+        Returns the ids of up to shortlist strings with the most trigrams in common with query,
+        weighted by their inverse document frequency, in the order the strings were added. Small
+        indices and short queries return all ids.
+        """
+        if len(self.keys) <= self.shortlist or len(process.default_processor(query)) < self.min_query_length:
+            return list(range(len(self.keys)))
+        postings = [self._postings[t] for t in trigrams(query) if t in self._postings]
+        if len(postings) == 0:
+            return []
+        selective = [p for p in postings if len(p) <= self.max_postings]
+        counts = collections.Counter()
+        for posting in selective or postings:
+            weight = math.log(1 + len(self.keys) / len(posting))
+            for id in posting:
+                counts[id] += weight
+        return sorted(heapq.nlargest(self.shortlist, counts, key=counts.__getitem__))
+
+    def search(self, query, limit):
+        """
+        Returns up to limit (key, score) tuples with the best thefuzz scores among the candidates,
+        best first. Equal scores keep the order the strings were added, or their sorted order with
+        sort_keys.
+        """
+        if len(process.default_processor(query)) == 0:
+            # Also avoids a thefuzz warning
+            return []
+        shortlist = [self.keys[id] for id in self.candidates(query)]
+        scores = process.extractWithoutOrder(query, shortlist)
+        if self.sort_keys:
+            return heapq.nsmallest(limit, scores, key=lambda s: (-s[1], s[0]))
+        return heapq.nlargest(limit, scores, key=lambda s: s[1])
+
+def trigrams(text):
+    """
+    Returns the trigrams of the words of text, padded with a space on both sides.
+    """
+    result = set()
+    for word in process.default_processor(text).split():
+        word = f" {word} "
+        result.update(word[i:i + 3] for i in range(len(word) - 2))
+    return result
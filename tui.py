@@ -1,8 +1,8 @@
-import urwid, re, json, os
-from thefuzz import process
+import re, json, os, atexit, collections, functools, heapq, time
 from dataclasses import dataclass, asdict
+from . import hledger, incremental
 from .rules.data import entry_id, Booking, BookingLine
-from .utils import sanitize_description, format_exact
+from .utils import sanitize_description
 
 @dataclass
 class TuiRule:
@@ -18,7 +18,7 @@ class TuiRule:
     def matches(self, entry):
         return (
             (not self.hash or entry_id(entry) == self.hash) and
-            (not self.regex or re.search(self.regex, entry.text, re.IGNORECASE)) and
+            (not self.pattern or self.pattern.search(entry.text)) and
             (not self.account or entry.account == self.account)
         )
 
@@ -26,355 +26,289 @@ class TuiRule:
         if self.regex is not None:
             re.compile(self.regex, re.IGNORECASE)
 
-class SuggestionLine(urwid.WidgetWrap):
+    @functools.cached_property
+    def pattern(self):
+        return re.compile(self.regex, re.IGNORECASE) if self.regex else None
+
+# The widgets moved to tui_widgets, which is only imported when one of them is needed.
+_WIDGETS = frozenset((
+    "SuggestionLine", "Suggestions", "RuleWindow", "BookingWindow", "PreviewWalker", "PreviewWindow", "MainWindow", "PREVIEW_DELAY",
+))
+
+def __getattr__(name):
+    # Other names, e.g. __path__ looked up by imports, must not import urwid.
+    if name not in _WIDGETS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from . import tui_widgets
+    return getattr(tui_widgets, name)
+
+class RuleBucket:
     def __init__(self):
-        self._marker = urwid.Text("")
-        self._text = urwid.Text("", wrap="ellipsis")
-        self._score = urwid.Text("")
-        self._layout = urwid.Columns([(2, urwid.AttrMap(self._marker, "em")), self._text, ("pack", self._score)])
-        super().__init__(self._layout)
-    
-    def set_selected(self, selected):
-        self._marker.set_text(">" if selected else "")
-
-    def set_text(self, text, score=None):
-        self._text.set_text(text)
-        self._score.set_text("" if score is None else f"  ({int(score)})")
-
-    def get_text(self):
-        return self._text.get_text()[0]
-
-class Suggestions(urwid.WidgetWrap):
-    def __init__(self, suggest):
-        self._suggest = suggest
-        self._done = False
-
-        self._input = urwid.Edit(wrap="clip")
-        urwid.connect_signal(self._input, "postchange", self._on_change)
-
-        self._lines = [SuggestionLine(), SuggestionLine(), SuggestionLine()]
-
-        self._pile = urwid.Pile([urwid.AttrMap(self._input, "input"), *self._lines])
-        super().__init__(self._pile)
-
-        self._refresh_suggestions()
-    
-    def keypress(self, size, key):
-        if key == "up" and not self._done:
-            self.set_selected("up")
-            return None
-        elif key == "down" and not self._done:
-            self.set_selected("down")
+        self.rules = []
+        self._prefilter = False
+
+    def append(self, position, rule):
+        self.rules.append((position, rule))
+        self._prefilter = False
+
+    def first(self, entry, best):
+        """
+        Returns (position, rule) of the first rule in this bucket matching the entry, or best if
+        there is none before best's position.
+        """
+        if self._prefilter is False:
+            self._prefilter = self._compile_prefilter()
+        if self._prefilter is not None and not self._prefilter.search(entry.text):
+            return best
+        for position, rule in self.rules:
+            if best is not None and position > best[0]:
+                break
+            if (not rule.pattern or rule.pattern.search(entry.text)) and (not rule.account or rule.account == entry.account):
+                return position, rule
+        return best
+
+    def all(self, entry, matches, evaluations):
+        """
+        Appends (position, rule) of all rules in this bucket matching the entry to matches and
+        (rulenum, seconds) of every rule evaluated to evaluations.
+        """
+        if self._prefilter is False:
+            self._prefilter = self._compile_prefilter()
+        if self._prefilter is not None and not self._prefilter.search(entry.text):
+            return
+        for position, rule in self.rules:
+            start = time.perf_counter()
+            matched = (not rule.pattern or rule.pattern.search(entry.text)) and (not rule.account or rule.account == entry.account)
+            evaluations.append((rule.rulenum, time.perf_counter() - start))
+            if matched:
+                matches.append((position, rule))
+
+    def _compile_prefilter(self):
+        # One alternation over all regexes of the bucket rejects most non-matching entries in a single search.
+        # Not possible if a rule has no regex (it matches everything) or if a regex refers to its own groups.
+        if len(self.rules) < 2 or any(not rule.regex or re.search(r"\\\d|\(\?P=|\(\?\(", rule.regex) for _, rule in self.rules):
             return None
-        elif key == "enter" and not self._done:
-            if self.get_selected_suggestion():
-                self._pile.contents = [(urwid.Text(self.get_selected_suggestion(), wrap="ellipsis"), ("weight", 1))]
-                self._done = True
-                urwid.emit_signal(self, "confirm")
+        try:
+            return re.compile("|".join(f"(?:{rule.regex})" for _, rule in self.rules), re.IGNORECASE)
+        except re.error:
             return None
-        else:
-            return super().keypress(size, key)
-
-    def _on_change(self, widget, old_value):
-        value = self._input.get_edit_text()
-        if "=" in value and not value.startswith("="):
-            self._input.set_edit_text("=")
-        else:
-            self._refresh_suggestions()
 
-    def set_selected(self, i):
-        if i == "up":
-            self._selected = max(self._selected - 1, 0)
-        elif i == "down":
-            self._selected = min(self._selected + 1, len(self._lines) - 1)
-        else:
-            self._selected = i
-
-        if self._lines[self._selected].get_text() == "":
-            self._selected = 0
-        
-        for i, line in enumerate(self._lines):
-            line.set_selected(i == self._selected)
-
-    def get_selected_suggestion(self):
-        return self._lines[self._selected].get_text()
-
-    def reset(self):
-        self._done = False
-        self._pile.contents = [(urwid.AttrMap(self._input, "input"), ("weight", 1)), *((line, ("weight", 1)) for line in self._lines)]
-        self._input.set_edit_text("")
-        self._refresh_suggestions()
-
-    def _refresh_suggestions(self):
-        if self._input.get_edit_text().startswith("="):
-            suggestions = [(self._input.get_edit_text()[1:], None)]
-        else:
-            suggestions = self._suggest(self._input.get_edit_text())
-            if len(suggestions) > 3:
-                suggestions = suggestions[:3]
-        
-        for i, line in enumerate(self._lines):
-            if i < len(suggestions):
-                suggestion = suggestions[i]
-                line.set_text(suggestion[0], suggestion[1])
+class RuleIndex:
+    """
+    Finds the first matching TuiRule without testing every rule. Rules are bucketed by hash, by
+    account and the rest. Every bucket is scanned in rule order and the earliest match over all
+    buckets wins, which is the same rule a linear scan over all rules would return.
+    """
+    def __init__(self, rules, stats=None):
+        self.entries = 0
+        self.matched = 0
+        self.seconds = 0.0
+        # If set, all rules of the buckets are evaluated to record their statistics, but only until
+        # an entry is counted with a match: rules are only appended, so its first match stays the same.
+        self.stats = stats
+        self.reset(rules)
+
+    def reset(self, rules):
+        self._by_hash = collections.defaultdict(RuleBucket)
+        self._by_account = collections.defaultdict(RuleBucket)
+        self._rest = RuleBucket()
+        for position, rule in enumerate(rules):
+            if rule.hash:
+                self._by_hash[rule.hash].append(position, rule)
+            elif rule.account:
+                self._by_account[rule.account].append(position, rule)
             else:
-                line.set_text("")
-        
-        self.set_selected(0)
-
-urwid.register_signal(Suggestions, ["confirm"])
+                self._rest.append(position, rule)
 
-class RuleWindow(urwid.WidgetWrap):
-    def __init__(self):
-        types = []
-        
-        self._type_single = urwid.RadioButton(types, "Apply to this entry only", state=True)
-        urwid.connect_signal(self._type_single, "postchange", self._change)
-
-        self._type_rule = urwid.RadioButton(types, "Create rule")
-        urwid.connect_signal(self._type_rule, "postchange", self._change)
-        urwid.connect_signal(self._type_rule, "postchange", self._focus_regex)
-        self._regex = urwid.Edit(("default", "Regular expression: "))
-        urwid.connect_signal(self._regex, "postchange", self._change)
-        self._only_from_account = urwid.CheckBox("", state=True)
-        urwid.connect_signal(self._only_from_account, "postchange", self._change)
-        
-        self._regex_widget = urwid.Padding(urwid.AttrMap(self._regex, "input"), left=2, right=2)
-        self._settings_box = urwid.Pile([
-            self._type_single,
-            urwid.Text(""),
-            self._type_rule,
-            self._regex_widget,
-            urwid.Padding(self._only_from_account, left=2, right=2)
-        ], focus_item=self._type_rule)
-                
-        super().__init__(urwid.Filler(self._settings_box, valign="top"))
-
-    def set_entry(self, entry):
-        self._entry = entry
-        self._only_from_account.set_label(f"Only from {entry.account}")
-        self._type_single.set_state(True)
-        self._regex.set_edit_text("")
-        self._only_from_account.set_state(True)
-        self._settings_box.focus = self._type_rule
-
-    def get_rule(self):
-        rule = TuiRule(
-            rulenum=None,
-            id=None,
-            hash=entry_id(self._entry) if self._type_single.get_state() else None,
-            regex=self._regex.get_edit_text() if self._type_rule.get_state() and self._regex.get_edit_text() else None,
-            account=self._entry.account if self._type_rule.get_state() and self._only_from_account.get_state() else None,
-            dest_account=None
-        )
-        try:
-            rule.validate_or_raise()
-            return rule
-        except Exception as e:
-            return "Error in rule expression: " + str(e)
-
-    def _change(self, *args, **kwargs):
-        urwid.emit_signal(self, "postchange", self.get_rule())
-
-    def _focus_regex(self, widget, old_value):
-        if self._type_rule.get_state():
-            self._settings_box.focus = self._regex_widget
-
-urwid.register_signal(RuleWindow, ["postchange"])
-
-class BookingWindow(urwid.WidgetWrap):
-    def __init__(self, format_args, suggest):
-        self._format_args = format_args
-
-        self._source_line = urwid.Text("", wrap="ellipsis")
-        self._booking_header = urwid.Text("", wrap="ellipsis")
-
-        self._source_account_text = urwid.Text("", wrap="ellipsis")
-        self._source_account_amount = urwid.Text("")
-        source_account = urwid.Columns([
-            ("weight", 1, urwid.Padding(self._source_account_text, left=2, right=2)),
-            ("pack", self._source_account_amount),
-        ])
-
-        self._dest_account = Suggestions(suggest)
-        urwid.connect_signal(self._dest_account, "confirm", lambda: urwid.emit_signal(self, "confirm"))
-
-        pile = urwid.Pile([
-            self._source_line,
-            urwid.Text(""),
-            self._booking_header,
-            source_account,
-            urwid.Padding(self._dest_account, left=2, right=16),
-        ])
-        layout = urwid.Filler(pile, valign="top")
-        super().__init__(layout)
-    
-    def set_entry(self, entry):
-        self._source_line.set_text(f"From {entry.source}:")
-        self._booking_header.set_text(f"{entry.date}  {sanitize_description(entry.text)}")
-        self._source_account_text.set_text(entry.account)
-        self._source_account_amount.set_text(format_exact(entry.amount, entry.currency, self._format_args))
-        self._dest_account.reset()
-    
-    def get_selected(self):
-        return self._dest_account.get_selected_suggestion()
-
-urwid.register_signal(BookingWindow, ["confirm"])
-
-class PreviewWindow(urwid.WidgetWrap):
-    def __init__(self):
-        self._list_walker = urwid.SimpleListWalker([])
-        self._list_box = urwid.ListBox(self._list_walker)
-        super().__init__(self._list_box)
-
-    def refresh(self, unassigned, rule):
-        self._list_walker.clear()
-        if isinstance(rule, str):
-            self._list_walker.append(urwid.Text(rule))
+    def match(self, entry):
+        start = time.perf_counter()
+        if self.stats is not None and not self.stats.counted(entry):
+            best = self._match_all(entry)
         else:
-            self._list_walker.append(urwid.Text("--- first line ---", align="center", wrap="ellipsis"))
-            for entry in unassigned:
-                if rule.matches(entry):
-                    self._list_walker.append(urwid.Text(f"{entry.date}  {sanitize_description(entry.text)}", wrap="ellipsis"))
-            self._list_walker.append(urwid.Text("--- last line ---", align="center", wrap="ellipsis"))
-
-
-class MainWindow(urwid.WidgetWrap):
-    def __init__(self, format_args, unassigned, assigned, rules, extra_accounts):
-        self._unassigned_original_len = len(unassigned)
-        self._unassigned = list(sorted(unassigned, key=lambda e: e.date))
-
-        self._accounts = set(extra_accounts)
-        self._texts = dict()
-        for entry, booking in sorted(assigned.items(), key=lambda i: i[0].date):
-            for line in booking.lines:
-                self._accounts.add(line.account)
-                if entry.text not in self._texts and line.account != entry.account:
-                    self._texts[entry.text] = line.account
-        self._accounts = list(sorted(self._accounts))
-
-        self._rules = rules
-
-        self._progress_text = urwid.Text("", align="center")
-        header = self._progress_text
-
-        self._booking = BookingWindow(format_args, self._suggest)
-        urwid.connect_signal(self._booking, "confirm", self._on_booking_confirm)
-
-        self._rule = RuleWindow()
-        urwid.connect_signal(self._rule, "postchange", self._on_rule_change)
-
-        self._preview = PreviewWindow()
-
-        self._booking_body = urwid.LineBox(self._booking, title="Booking", bline="", trcorner="┬")
-        self._rule_body = urwid.LineBox(self._rule, title="Rule", tlcorner="├", trcorner="┤", brcorner="┴")
-        preview_body = urwid.LineBox(self._preview, title="Preview", lline="", tlcorner="─", blcorner="─")
-
-        self._left_pile = urwid.Pile([self._booking_body, self._rule_body])
-        self._frame_body = urwid.Columns([self._left_pile, preview_body])
-
-        self._shortcuts = urwid.Text([
-            ("em", "UP"), "/", ("em", "DOWN"), "/", ("em", "ENTER"), " Select suggestion  ",
-            ("em", "^X"), " Confirm entry  ",
-            ("em", "^N"), " Skip entry  ",
-            ("em", "^C"), " Save and quit",
-        ], wrap="ellipsis");
-        footer = self._shortcuts
-
-        frame = urwid.Frame(self._frame_body, header=header, footer=footer)
-
-        super().__init__(frame)
-
-        self._jump_to_entry()
-    
-    def keypress(self, size, key):
-        if key == "ctrl x":
-            selected = self._booking.get_selected()
-            if not selected:
-                return None
-            rule = self._rule.get_rule()
-            if isinstance(rule, str):
-                return None
-            if not rule.matches(self._unassigned[0]):
-                return None
-
-            if selected not in self._accounts:
-                self._accounts.append(selected)
-                self._accounts.sort()
-            self._texts[self._unassigned[0].text] = selected
-            
-            self._unassigned = [u for u in self._unassigned if not rule.matches(u)]
-
-            rule.rulenum = (max(rule.rulenum for rule in self._rules) if self._rules else 0) + 1
-            rule.dest_account = selected
-            self._rules.append(rule)
-            
-            self._jump_to_entry()
-        elif key == "ctrl n":
-            self._unassigned = self._unassigned[1:]
-            self._jump_to_entry()
-        else:
-            return super().keypress(size, key)
-
-    def _jump_to_entry(self):
-        if len(self._unassigned) == 0:
-            raise urwid.ExitMainLoop()
-
-        done = self._unassigned_original_len - len(self._unassigned)
-        self._progress_text.set_text(f"TUI Rules {done + 1}/{self._unassigned_original_len} ({int(done / self._unassigned_original_len * 100)}%)")
-
-        self._booking.set_entry(self._unassigned[0])
-        self._rule.set_entry(self._unassigned[0])
-        self._preview.refresh(self._unassigned, self._rule.get_rule())
-        self._left_pile.focus = self._booking_body
-        self._frame_body.set_focus(self._left_pile)
-        self._w.focus_position = "body"
-    
-    def _on_booking_confirm(self):
-        self._left_pile.focus = self._rule_body
-
-    def _on_rule_change(self, rule):
-        self._preview.refresh(self._unassigned, rule)
-
-    def _suggest(self, value):
-        if value == "":
-            scores = list(process.extractWithoutOrder(self._unassigned[0].text, self._texts.keys()))
-            scores.sort(key=lambda s: s[1], reverse=True)
-            best = []
-            for text, score in scores:
-                if len(best) >= 3:
-                    break
-                account = self._texts[text]
-                already_in_best = False
-                for acc, _ in best:
-                    if acc == account:
-                        already_in_best = True
-                        break
-                if not already_in_best:
-                    best.append((account, score))
-            return best
-        else:
-            # Second part of the if is to avoid a thefuzz warning.
-            if len(self._accounts) > 0 and len(process.default_processor(value)) > 0:
-                return process.extract(value, self._accounts, limit=3)
-            else:
-                return []
+            best = self._match_first(entry)
+        self.seconds += time.perf_counter() - start
+        self.entries += 1
+        if best is None:
+            return None
+        self.matched += 1
+        return best[1]
+
+    def _match_first(self, entry):
+        best = None
+        if self._by_hash:
+            bucket = self._by_hash.get(entry_id(entry))
+            if bucket is not None:
+                best = bucket.first(entry, best)
+        bucket = self._by_account.get(entry.account)
+        if bucket is not None:
+            best = bucket.first(entry, best)
+        return self._rest.first(entry, best)
+
+    def _match_all(self, entry):
+        matches = []
+        evaluations = []
+        self.all(entry, matches, evaluations)
+        self.stats.record(entry, matches, evaluations)
+        return min(matches, key=lambda m: m[0]) if matches else None
+
+    def all(self, entry, matches, evaluations):
+        """
+        Appends (position, rule) of all rules matching the entry to matches and (rulenum, seconds)
+        of every rule evaluated to evaluations.
+        """
+        if self._by_hash:
+            bucket = self._by_hash.get(entry_id(entry))
+            if bucket is not None:
+                bucket.all(entry, matches, evaluations)
+        bucket = self._by_account.get(entry.account)
+        if bucket is not None:
+            bucket.all(entry, matches, evaluations)
+        self._rest.all(entry, matches, evaluations)
+
+    def summary(self):
+        rate = self.entries / self.seconds if self.seconds > 0 else 0
+        return f"TUI rules: {self.matched}/{self.entries} entries matched in {self.seconds:.3f}s ({rate:.0f} entries/s)"
+
+class RuleStats:
+    """
+    Counts per rule how often it was evaluated, how often it matched, how often it was the first
+    match, i.e., fired, and the time spent evaluating it. Rules matching the same entry overlap:
+    their order decides which one fires.
 
-def configure(*, format, rules_path, extra_accounts_path=None):
+    Every entry is counted once per run, even if it is converted again, e.g. after the unassigned
+    handler added rules. Its evaluations are the ones of its first conversion. As an entry counted
+    with a match is not evaluated again, recount has to be called after rules were added.
+    """
+    def __init__(self):
+        self.entries = 0
+        self.evaluations = collections.Counter()
+        self.seconds = collections.Counter()
+        self.matches = collections.Counter()
+        self.hits = collections.Counter()
+        self.overlaps = set()  # pairs of rulenums
+        self._matched = dict()  # entry id -> whether a rule matched it
+        self._entries = dict()  # entry id -> entry
+
+    def counted(self, entry):
+        """
+        Returns whether the entry was counted with a match already.
+        """
+        return self._matched.get(entry_id(entry), False)
+
+    def record(self, entry, matches, evaluations):
+        key = entry_id(entry)
+        if key not in self._matched:
+            self.entries += 1
+            self._entries[key] = entry
+            for rulenum, seconds in evaluations:
+                self.evaluations[rulenum] += 1
+                self.seconds[rulenum] += seconds
+        self._matched[key] = bool(matches)
+        self._count(matches)
+
+    def recount(self, rules):
+        """
+        Counts the matches, hits and overlaps of all entries seen again with rules, e.g. with the
+        rules added by the unassigned handler. The evaluations and times are kept.
+        """
+        self.matches.clear()
+        self.hits.clear()
+        self.overlaps.clear()
+        index = RuleIndex(rules)
+        for key, entry in self._entries.items():
+            matches = []
+            index.all(entry, matches, [])
+            self._matched[key] = bool(matches)
+            self._count(matches)
+
+    def _count(self, matches):
+        if not matches:
+            return
+        matches = sorted(matches, key=lambda m: m[0])
+        self.hits[matches[0][1].rulenum] += 1
+        for i, (_, rule) in enumerate(matches):
+            self.matches[rule.rulenum] += 1
+            for _, other in matches[i + 1:]:
+                self.overlaps.add((rule.rulenum, other.rulenum))
+
+    def report(self, rules):
+        """
+        Returns the statistics of rules as dict. Dead rules never matched, shadowed rules matched
+        but an earlier rule always matched as well.
+        """
+        return {
+            "entries": self.entries,
+            "evaluations_per_entry": sum(self.evaluations.values()) / self.entries if self.entries else 0,
+            "rules": [
+                {
+                    "rulenum": rule.rulenum, "regex": rule.regex, "account": rule.account, "hash": rule.hash, "dest_account": rule.dest_account,
+                    "hits": self.hits[rule.rulenum], "matches": self.matches[rule.rulenum],
+                    "evaluations": self.evaluations[rule.rulenum], "seconds": self.seconds[rule.rulenum],
+                }
+                for rule in rules
+            ],
+            "dead": [rule.rulenum for rule in rules if self.matches[rule.rulenum] == 0],
+            "shadowed": [rule.rulenum for rule in rules if self.matches[rule.rulenum] > 0 and self.hits[rule.rulenum] == 0],
+            "overlaps": sorted(self.overlaps),
+        }
+
+    def reorder(self, rules):
+        """
+        Returns the rules ordered by hits, most first, except that overlapping rules keep their
+        relative order, so every entry seen is still matched by the same rule.
+        """
+        position = {rule.rulenum: i for i, rule in enumerate(rules)}
+        before = collections.defaultdict(list)
+        waiting = collections.Counter()
+        for a, b in self.overlaps:
+            first, second = sorted((a, b), key=position.__getitem__)
+            before[first].append(second)
+            waiting[second] += 1
+        ready = [(-self.hits[rule.rulenum], i) for i, rule in enumerate(rules) if waiting[rule.rulenum] == 0]
+        heapq.heapify(ready)
+        result = []
+        while ready:
+            _, i = heapq.heappop(ready)
+            result.append(rules[i])
+            for rulenum in before[rules[i].rulenum]:
+                waiting[rulenum] -= 1
+                if waiting[rulenum] == 0:
+                    heapq.heappush(ready, (-self.hits[rulenum], position[rulenum]))
+        return result
+
+def configure(*, format, rules_path, extra_accounts_path=None, report=False, stats_path=None, reorder=False):
     """
     Returns a tuple of a converter and unassigned_handler. If you want to use custom rules
     as well, call the returned converter in your converter (at the end). Otherwise you can
     use the converter as an argument to money.main.
 
     extra_accounts_path is an optional path to a file where hledger account statements are
-    parsed in order to pre-fill the suggested accounts. This is useful if you have no
-    classified entries yet. A useful path is probably your main.journal file.
+    parsed in order to pre-fill the suggested accounts. Journals it includes are parsed as well,
+    except for the generated ones in the output directory next to it.
+    This is useful if you have no classified entries yet. A useful path is probably your
+    main.journal file.
+
+    If report is set, the number of entries passed to the converter and the match rate
+    are printed when the program exits.
+
+    If stats_path is set, all rules are evaluated once for every entry instead of only the ones up
+    to the first match, which makes the conversion slower. The hits, matches, evaluations and time
+    per rule, the dead and shadowed rules and the overlapping rules are written there as JSON when
+    the program exits. An entry converted again, e.g. after rules were added, is not counted twice.
+    If reorder is set, the rules file is then rewritten with the rules that fired most first, as far
+    as this does not change which rule matches the entries seen (see RuleStats.reorder).
+
+    The statistics only cover the entries passed to the converter in this process. main.main
+    therefore refuses to reorder together with Config.parallel_assign or Config.signature, as long
+    as it gets the returned converter itself.
     """
     extra_accounts = []
     if extra_accounts_path:
-        with open(extra_accounts_path, "r") as fp:
-            for match in re.findall(r"^\s*account\s+([^;\r\n]*[^;\s]).*$", fp.read(), re.MULTILINE | re.IGNORECASE):
-                extra_accounts.append(match)
+        base_path = os.path.dirname(os.path.abspath(extra_accounts_path))
+        # The generated journals declare no accounts and change on every run.
+        scanner = hledger.Scanner(incremental.cache_path(base_path, "journals.json"), exclude=[os.path.join(base_path, "output")])
+        extra_accounts = list(scanner.accounts(extra_accounts_path))
+        scanner.save()
 
     if os.path.exists(rules_path):
         with open(rules_path, "r", encoding="UTF-8") as fp:
@@ -384,29 +318,68 @@ def configure(*, format, rules_path, extra_accounts_path=None):
         with open(rules_path, "w", encoding="UTF-8") as fp:
             json.dump(rules, fp)
 
+    def save_rules():
+        with open(rules_path, "w", encoding="UTF-8") as fp:
+            json.dump([asdict(rule) for rule in rules], fp, indent=2)
+
+    stats = RuleStats() if stats_path or reorder else None
+    index = RuleIndex(rules, stats)
+    if report:
+        atexit.register(lambda: print(index.summary()))
+
+    added_rules = False
+
+    def write_stats():
+        if added_rules:
+            # Entries counted with a match were not evaluated against the added rules.
+            stats.recount(rules)
+        if stats_path:
+            with open(stats_path, "w", encoding="UTF-8") as fp:
+                json.dump(stats.report(rules), fp, indent=2)
+        if reorder and stats.entries > 0:
+            rules[:] = stats.reorder(rules)
+            save_rules()
+            print(f"TUI rules: reordered {len(rules)} rules in {rules_path}")
+    if stats is not None:
+        atexit.register(write_stats)
+
     def unassigned_handler(unassigned, assigned):
+        nonlocal added_rules
+        # Only imported when there is something to assign, as urwid and thefuzz take a while to load.
+        import urwid
+        from .tui_widgets import MainWindow
         palette = [
             (None, "default", "default"),
             ("em", "default,bold", "default"),
             ("input", "default,bold,underline", "default"),
             ("focus", "default,standout", "default"),
         ]
+        rule_count = len(rules)
         try:
-            urwid.MainLoop(MainWindow(format, unassigned, assigned, rules, extra_accounts), palette=palette).run()
+            window = MainWindow(format, unassigned, assigned, rules, extra_accounts)
+            window.loop = urwid.MainLoop(window, palette=palette)
+            window.loop.run()
         except KeyboardInterrupt:
             pass
 
-        with open(rules_path, "w", encoding="UTF-8") as fp:
-            json.dump([asdict(rule) for rule in rules], fp, indent=2)
+        save_rules()
+
+        index.reset(rules)
+        added_rules = added_rules or len(rules) > rule_count
+
+        # New rules are appended, so they can only change the result for entries that had no matching rule.
+        return unassigned
 
     def converter(entry):
-        for rule in rules:
-            if rule.matches(entry):
-                lines = [
-                    BookingLine(account=entry.account, amount=entry.amount, commodity=entry.currency),
-                    BookingLine(account=rule.dest_account, amount=None, commodity=None),
-                ]
-                return Booking(date=entry.date, description=f"{sanitize_description(entry.text)} (rule #{rule.rulenum})", lines=lines)
-        return None
+        rule = index.match(entry)
+        if rule is None:
+            return None
+        lines = [
+            BookingLine(account=entry.account, amount=entry.amount, commodity=entry.currency),
+            BookingLine(account=rule.dest_account, amount=None, commodity=None),
+        ]
+        return Booking(date=entry.date, description=f"{sanitize_description(entry.text)} (rule #{rule.rulenum})", lines=lines)
+    # See main.main
+    converter.needs_every_entry = reorder
 
     return converter, unassigned_handler
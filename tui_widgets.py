@@ -0,0 +1,461 @@
+import urwid, itertools
+from .rules.data import entry_id
+from .suggest import SuggestionIndex
+from .tui import TuiRule
+from .utils import sanitize_description, format_exact
+
+class SuggestionLine(urwid.WidgetWrap):
+    def __init__(self):
+        self._marker = urwid.Text("")
+        self._text = urwid.Text("", wrap="ellipsis")
+        self._score = urwid.Text("")
+        self._layout = urwid.Columns([(2, urwid.AttrMap(self._marker, "em")), self._text, ("pack", self._score)])
+        super().__init__(self._layout)
+    
+    def set_selected(self, selected):
+        self._marker.set_text(">" if selected else "")
+
+    def set_text(self, text, score=None):
+        self._text.set_text(text)
+        self._score.set_text("" if score is None else f"  ({int(score)})")
+
+    def get_text(self):
+        return self._text.get_text()[0]
+
+class Suggestions(urwid.WidgetWrap):
+    def __init__(self, suggest):
+        self._suggest = suggest
+        self._done = False
+
+        self._input = urwid.Edit(wrap="clip")
+        urwid.connect_signal(self._input, "postchange", self._on_change)
+
+        self._lines = [SuggestionLine(), SuggestionLine(), SuggestionLine()]
+
+        self._pile = urwid.Pile([urwid.AttrMap(self._input, "input"), *self._lines])
+        super().__init__(self._pile)
+
+        self._refresh_suggestions()
+    
+    def keypress(self, size, key):
+        if key == "up" and not self._done:
+            self.set_selected("up")
+            return None
+        elif key == "down" and not self._done:
+            self.set_selected("down")
+            return None
+        elif key == "enter" and not self._done:
+            if self.get_selected_suggestion():
+                self._pile.contents = [(urwid.Text(self.get_selected_suggestion(), wrap="ellipsis"), ("weight", 1))]
+                self._done = True
+                urwid.emit_signal(self, "confirm")
+            return None
+        else:
+            return super().keypress(size, key)
+
+    def _on_change(self, widget, old_value):
+        value = self._input.get_edit_text()
+        if "=" in value and not value.startswith("="):
+            self._input.set_edit_text("=")
+        else:
+            self._refresh_suggestions()
+
+    def set_selected(self, i):
+        if i == "up":
+            self._selected = max(self._selected - 1, 0)
+        elif i == "down":
+            self._selected = min(self._selected + 1, len(self._lines) - 1)
+        else:
+            self._selected = i
+
+        if self._lines[self._selected].get_text() == "":
+            self._selected = 0
+        
+        for i, line in enumerate(self._lines):
+            line.set_selected(i == self._selected)
+
+    def get_selected_suggestion(self):
+        return self._lines[self._selected].get_text()
+
+    def reset(self):
+        self._done = False
+        self._pile.contents = [(urwid.AttrMap(self._input, "input"), ("weight", 1)), *((line, ("weight", 1)) for line in self._lines)]
+        self._input.set_edit_text("")
+        self._refresh_suggestions()
+
+    def _refresh_suggestions(self):
+        if self._input.get_edit_text().startswith("="):
+            suggestions = [(self._input.get_edit_text()[1:], None)]
+        else:
+            suggestions = self._suggest(self._input.get_edit_text())
+            if len(suggestions) > 3:
+                suggestions = suggestions[:3]
+        
+        for i, line in enumerate(self._lines):
+            if i < len(suggestions):
+                suggestion = suggestions[i]
+                line.set_text(suggestion[0], suggestion[1])
+            else:
+                line.set_text("")
+        
+        self.set_selected(0)
+
+urwid.register_signal(Suggestions, ["confirm"])
+
+class RuleWindow(urwid.WidgetWrap):
+    def __init__(self):
+        types = []
+        
+        self._type_single = urwid.RadioButton(types, "Apply to this entry only", state=True)
+        urwid.connect_signal(self._type_single, "postchange", self._change)
+
+        self._type_rule = urwid.RadioButton(types, "Create rule")
+        urwid.connect_signal(self._type_rule, "postchange", self._change)
+        urwid.connect_signal(self._type_rule, "postchange", self._focus_regex)
+        self._regex = urwid.Edit(("default", "Regular expression: "))
+        urwid.connect_signal(self._regex, "postchange", self._change)
+        self._only_from_account = urwid.CheckBox("", state=True)
+        urwid.connect_signal(self._only_from_account, "postchange", self._change)
+        
+        self._regex_widget = urwid.Padding(urwid.AttrMap(self._regex, "input"), left=2, right=2)
+        self._settings_box = urwid.Pile([
+            self._type_single,
+            urwid.Text(""),
+            self._type_rule,
+            self._regex_widget,
+            urwid.Padding(self._only_from_account, left=2, right=2)
+        ], focus_item=self._type_rule)
+                
+        super().__init__(urwid.Filler(self._settings_box, valign="top"))
+
+    def set_entry(self, entry):
+        self._entry = entry
+        self._only_from_account.set_label(f"Only from {entry.account}")
+        self._type_single.set_state(True)
+        self._regex.set_edit_text("")
+        self._only_from_account.set_state(True)
+        self._settings_box.focus = self._type_rule
+
+    def get_rule(self):
+        rule = TuiRule(
+            rulenum=None,
+            id=None,
+            hash=entry_id(self._entry) if self._type_single.get_state() else None,
+            regex=self._regex.get_edit_text() if self._type_rule.get_state() and self._regex.get_edit_text() else None,
+            account=self._entry.account if self._type_rule.get_state() and self._only_from_account.get_state() else None,
+            dest_account=None
+        )
+        try:
+            rule.validate_or_raise()
+            return rule
+        except Exception as e:
+            return "Error in rule expression: " + str(e)
+
+    def _change(self, *args, **kwargs):
+        urwid.emit_signal(self, "postchange", self.get_rule())
+
+    def _focus_regex(self, widget, old_value):
+        if self._type_rule.get_state():
+            self._settings_box.focus = self._regex_widget
+
+urwid.register_signal(RuleWindow, ["postchange"])
+
+class BookingWindow(urwid.WidgetWrap):
+    def __init__(self, format_args, suggest):
+        self._format_args = format_args
+
+        self._source_line = urwid.Text("", wrap="ellipsis")
+        self._booking_header = urwid.Text("", wrap="ellipsis")
+
+        self._source_account_text = urwid.Text("", wrap="ellipsis")
+        self._source_account_amount = urwid.Text("")
+        source_account = urwid.Columns([
+            ("weight", 1, urwid.Padding(self._source_account_text, left=2, right=2)),
+            ("pack", self._source_account_amount),
+        ])
+
+        self._dest_account = Suggestions(suggest)
+        urwid.connect_signal(self._dest_account, "confirm", lambda: urwid.emit_signal(self, "confirm"))
+
+        pile = urwid.Pile([
+            self._source_line,
+            urwid.Text(""),
+            self._booking_header,
+            source_account,
+            urwid.Padding(self._dest_account, left=2, right=16),
+        ])
+        layout = urwid.Filler(pile, valign="top")
+        super().__init__(layout)
+    
+    def set_entry(self, entry):
+        self._source_line.set_text(f"From {entry.source}:")
+        self._booking_header.set_text(f"{entry.date}  {sanitize_description(entry.text)}")
+        self._source_account_text.set_text(entry.account)
+        self._source_account_amount.set_text(format_exact(entry.amount, entry.currency, self._format_args))
+        self._dest_account.reset()
+    
+    def get_selected(self):
+        return self._dest_account.get_selected_suggestion()
+
+urwid.register_signal(BookingWindow, ["confirm"])
+
+# Seconds to wait after a change of the rule before the preview is updated
+PREVIEW_DELAY = 0.05
+
+class PreviewWalker(urwid.ListWalker):
+    """
+    Lists the entries matching a rule between a first and a last line. Entries are only matched
+    when the ListBox asks for them, i.e., as far as they are visible.
+    """
+    def __init__(self):
+        self.focus = 0
+        self._entries = []
+        self._rule = None
+        self._set(urwid.Text(""), [], iter(()))
+
+    def _set(self, first, matched, candidates):
+        self._widgets = {0: first}
+        self._matched = matched  # indices of the matching entries found so far
+        self._candidates = candidates  # indices of the entries not matched yet
+        self._complete = False
+        self.focus = 0
+        self._modified()
+
+    def set_message(self, message):
+        self._rule = None
+        self._set(urwid.Text(message), [], iter(()))
+        self._complete = None
+
+    def set_rule(self, entries, candidates, rule):
+        """
+        Lists the entries[i] for all i in the iterable candidates that match rule.
+        """
+        if self._rule is not None and entries is self._entries:
+            if rule == self._rule:
+                return
+            if _narrows(self._rule, rule):
+                # Only the entries that matched the previous rule can match the new one.
+                candidates = itertools.chain(self._matched, self._candidates)
+        self._entries = entries
+        self._rule = rule
+        self._set(urwid.Text("--- first line ---", align="center", wrap="ellipsis"), [], candidates)
+
+    def matches(self):
+        """
+        Returns the indices of all entries matching the rule.
+        """
+        self._match_until(len(self._entries))
+        return self._matched
+
+    def _match_until(self, count):
+        while len(self._matched) < count and not self._complete:
+            i = next(self._candidates, None)
+            if i is None:
+                self._complete = True
+            elif self._rule.matches(self._entries[i]):
+                self._matched.append(i)
+
+    def _widget(self, position):
+        if position in self._widgets:
+            return self._widgets[position]
+        if position < 0 or self._complete is None:
+            return None
+        self._match_until(position)
+        if position <= len(self._matched):
+            entry = self._entries[self._matched[position - 1]]
+            widget = urwid.Text(f"{entry.date}  {sanitize_description(entry.text)}", wrap="ellipsis")
+        elif position == len(self._matched) + 1:
+            widget = urwid.Text("--- last line ---", align="center", wrap="ellipsis")
+        else:
+            return None
+        self._widgets[position] = widget
+        return widget
+
+    def get_focus(self):
+        return self._widget(self.focus), self.focus
+
+    def set_focus(self, position):
+        self.focus = position
+        self._modified()
+
+    def get_next(self, position):
+        widget = self._widget(position + 1)
+        return (widget, position + 1) if widget is not None else (None, None)
+
+    def get_prev(self, position):
+        widget = self._widget(position - 1)
+        return (widget, position - 1) if widget is not None else (None, None)
+
+def _narrows(old, new):
+    """
+    Whether every entry matching the rule new also matches the rule old, i.e., the regex of new is
+    a literal text starting with the literal text of old and everything else is the same.
+    """
+    literal = lambda regex: regex is not None and not any(c in regex for c in ".^$*+?{}[]\\|()")
+    return (
+        old.hash == new.hash and old.account == new.account and
+        literal(old.regex) and literal(new.regex) and new.regex.startswith(old.regex)
+    )
+
+class PreviewWindow(urwid.WidgetWrap):
+    def __init__(self):
+        self._walker = PreviewWalker()
+        super().__init__(urwid.ListBox(self._walker))
+
+    def refresh(self, unassigned, candidates, rule):
+        if isinstance(rule, str):
+            self._walker.set_message(rule)
+        else:
+            self._walker.set_rule(unassigned, candidates, rule)
+
+    def matches(self):
+        return self._walker.matches()
+
+    def clear(self):
+        self._walker.set_message("")
+
+
+class MainWindow(urwid.WidgetWrap):
+    def __init__(self, format_args, unassigned, assigned, rules, extra_accounts):
+        self._unassigned_original_len = len(unassigned)
+        self._unassigned = list(sorted(unassigned, key=lambda e: e.date))
+        # Entries are not removed from _unassigned, but marked as done when assigned or skipped.
+        self._done = bytearray(len(self._unassigned))
+        self._position = 0  # of the current entry
+        self._remaining = len(self._unassigned)
+        # Set to the MainLoop to delay updates of the preview while typing
+        self.loop = None
+        self._preview_alarm = None
+
+        self._accounts = set(extra_accounts)
+        self._texts = dict()
+        for entry, booking in sorted(assigned.items(), key=lambda i: i[0].date):
+            for line in booking.lines:
+                self._accounts.add(line.account)
+                if entry.text not in self._texts and line.account != entry.account:
+                    self._texts[entry.text] = line.account
+        # Accounts added later are ranked as if they were inserted in sorted order.
+        self._accounts = SuggestionIndex(sorted(self._accounts), sort_keys=True)
+        self._text_index = SuggestionIndex(self._texts.keys())
+
+        self._rules = rules
+
+        self._progress_text = urwid.Text("", align="center")
+        header = self._progress_text
+
+        self._booking = BookingWindow(format_args, self._suggest)
+        urwid.connect_signal(self._booking, "confirm", self._on_booking_confirm)
+
+        self._rule = RuleWindow()
+        urwid.connect_signal(self._rule, "postchange", self._on_rule_change)
+
+        self._preview = PreviewWindow()
+
+        self._booking_body = urwid.LineBox(self._booking, title="Booking", bline="", trcorner="┬")
+        self._rule_body = urwid.LineBox(self._rule, title="Rule", tlcorner="├", trcorner="┤", brcorner="┴")
+        preview_body = urwid.LineBox(self._preview, title="Preview", lline="", tlcorner="─", blcorner="─")
+
+        self._left_pile = urwid.Pile([self._booking_body, self._rule_body])
+        self._frame_body = urwid.Columns([self._left_pile, preview_body])
+
+        self._shortcuts = urwid.Text([
+            ("em", "UP"), "/", ("em", "DOWN"), "/", ("em", "ENTER"), " Select suggestion  ",
+            ("em", "^X"), " Confirm entry  ",
+            ("em", "^N"), " Skip entry  ",
+            ("em", "^C"), " Save and quit",
+        ], wrap="ellipsis");
+        footer = self._shortcuts
+
+        frame = urwid.Frame(self._frame_body, header=header, footer=footer)
+
+        super().__init__(frame)
+
+        self._jump_to_entry()
+    
+    def keypress(self, size, key):
+        if key == "ctrl x":
+            selected = self._booking.get_selected()
+            if not selected:
+                return None
+            rule = self._rule.get_rule()
+            if isinstance(rule, str):
+                return None
+            entry = self._unassigned[self._position]
+            if not rule.matches(entry):
+                return None
+
+            self._accounts.add(selected)
+            self._texts[entry.text] = selected
+            self._text_index.add(entry.text)
+
+            self._refresh_preview(rule)
+            matches = self._preview.matches()
+            for i in matches:
+                self._done[i] = 1
+            self._remaining -= len(matches)
+            self._preview.clear()
+
+            rule.rulenum = (max(rule.rulenum for rule in self._rules) if self._rules else 0) + 1
+            rule.dest_account = selected
+            self._rules.append(rule)
+            
+            self._jump_to_entry()
+        elif key == "ctrl n":
+            self._done[self._position] = 1
+            self._remaining -= 1
+            self._preview.clear()
+            self._jump_to_entry()
+        else:
+            return super().keypress(size, key)
+
+    def _open_entries(self):
+        return (i for i in range(self._position, len(self._unassigned)) if not self._done[i])
+
+    def _jump_to_entry(self):
+        while self._position < len(self._unassigned) and self._done[self._position]:
+            self._position += 1
+        if self._position == len(self._unassigned):
+            raise urwid.ExitMainLoop()
+
+        done = self._unassigned_original_len - self._remaining
+        self._progress_text.set_text(f"TUI Rules {done + 1}/{self._unassigned_original_len} ({int(done / self._unassigned_original_len * 100)}%)")
+
+        entry = self._unassigned[self._position]
+        self._booking.set_entry(entry)
+        self._rule.set_entry(entry)
+        self._refresh_preview(self._rule.get_rule())
+        self._left_pile.focus = self._booking_body
+        self._frame_body.set_focus(self._left_pile)
+        self._w.focus_position = "body"
+    
+    def _on_booking_confirm(self):
+        self._left_pile.focus = self._rule_body
+
+    def _on_rule_change(self, rule):
+        if self.loop is None:
+            self._refresh_preview(rule)
+            return
+        if self._preview_alarm is not None:
+            self.loop.remove_alarm(self._preview_alarm)
+        self._preview_alarm = self.loop.set_alarm_in(PREVIEW_DELAY, lambda loop, data: self._refresh_preview(rule))
+
+    def _refresh_preview(self, rule):
+        if self._preview_alarm is not None:
+            self.loop.remove_alarm(self._preview_alarm)
+            self._preview_alarm = None
+        self._preview.refresh(self._unassigned, self._open_entries(), rule)
+
+    def _suggest(self, value):
+        if value == "":
+            best = []
+            accounts = set()
+            for text, score in self._text_index.search(self._unassigned[self._position].text, limit=self._text_index.shortlist):
+                if len(best) >= 3:
+                    break
+                account = self._texts[text]
+                if account not in accounts:
+                    accounts.add(account)
+                    best.append((account, score))
+            return best
+        else:
+            return self._accounts.search(value, limit=3)
@@ -4,8 +4,12 @@ import datetime
 import collections
 from fractions import Fraction
 from decimal import Decimal
+import decimal
+import functools
 import sys
 
+from .amount import Money, decimal_scale
+
 Entry = collections.namedtuple("Entry", ("source", "account", "date", "text", "amount", "currency"))
 Assert = collections.namedtuple("Assert", ("source", "account", "date", "amount", "currency"))
 Raw = collections.namedtuple("Raw", ("source", "date", "text", "lines"))
@@ -23,7 +27,7 @@ def namedtuple_pformat(tuple, format_args):
     for field in tuple._fields:
         padding = (longest_field_len - len(field)) + 1
         value = getattr(tuple, field)
-        if type(value) == Fraction:
+        if type(value) in (Fraction, Money):
             value = format_number_exact(value, format_args, min_decimal=2)
         str += f"{' ' * indent}{field}{' ' * padding}= {pformat(value, compact=True, width=sys.maxsize)},\n"
     str += ")"
@@ -31,20 +35,35 @@ def namedtuple_pformat(tuple, format_args):
 
 
 def write_booking(fp, booking, format_args):
-    fp.write(f"{booking.date} {sanitize_description(booking.description)}\n")
+    fp.write(format_booking(booking, format_args))
+
+def write_assert(fp, account, date, amount, commodity, format_args):
+    fp.write(format_assert(account, date, amount, commodity, format_args))
+
+def format_booking(booking, format_args):
+    parts = [f"{booking.date} {sanitize_description(booking.description)}\n"]
     for line in booking.lines:
-        line_str = None
         if line.amount is None:
-            line_str = f"  {line.account}"
+            parts.append(f"  {line.account}\n")
         else:
-            line_str = f"  {line.account}  {format_exact(line.amount, line.commodity, format_args)}"
-        fp.write(line_str + "\n")
-    fp.write(f"\n")
+            parts.append(f"  {line.account}  {format_exact(line.amount, line.commodity, format_args)}\n")
+    parts.append("\n")
+    return "".join(parts)
 
-def write_assert(fp, account, date, amount, commodity, format_args):
-    fp.write(f"{date} ASSERT\n")
-    fp.write(f"  {account}  =={format_exact(amount, commodity, format_args)}\n")
-    fp.write(f"\n")
+def format_assert(account, date, amount, commodity, format_args):
+    return f"{date} ASSERT\n  {account}  =={format_exact(amount, commodity, format_args)}\n\n"
+
+def render_journal(items, format_args):
+    """
+    Renders a list of bookings and Assert entries as the text of a journal file.
+    """
+    parts = []
+    for item in items:
+        if isinstance(item, Assert):
+            parts.append(format_assert(item.account, item.date, item.amount, item.currency, format_args))
+        else:
+            parts.append(format_booking(item, format_args))
+    return "".join(parts)
 
 def format_exact(amount, commodity, format_args, min_decimal=None):
     # This is an hledger commodity with an exchange value, i.e., VGWL @@ 1234 EUR.
@@ -65,6 +84,47 @@ def format_exact(amount, commodity, format_args, min_decimal=None):
     return f"{result} {escaped_commodity}"
 
 def format_number_exact(amount, format_args, min_decimal=0):
+    if isinstance(amount, int):
+        return _format_number_exact_cached(amount, format_args.decimal_separator, min_decimal)
+    if isinstance(amount, (Fraction, Money)):
+        return _format_number_exact_fast(amount, format_args.decimal_separator, min_decimal)
+    return _format_number_exact_decimal(amount, format_args.decimal_separator, min_decimal)
+
+def _format_number_exact_fast(amount, decimal_separator, min_decimal):
+    # Integers are in the smallest currency unit, i.e., cents.
+    if isinstance(amount, int):
+        numerator, scale = amount, 2
+    elif type(amount) is Money and amount.mantissa is not None:
+        numerator, scale = amount.mantissa, amount.scale
+    else:
+        numerator, scale = decimal_scale(amount)
+        if numerator is None:
+            return _format_number_exact_decimal(amount, decimal_separator, min_decimal)
+    # Like Decimal division, use the smallest exponent needed to represent the number exactly.
+    while scale > 0 and numerator % 10 == 0:
+        numerator //= 10
+        scale -= 1
+    digits = str(abs(numerator))
+    if len(digits) > decimal.getcontext().prec:
+        return _format_number_exact_decimal(amount, decimal_separator, min_decimal)
+
+    result = "-" if numerator < 0 else ""
+    if scale > 0:
+        if len(digits) <= scale:
+            digits = "0" * (scale - len(digits) + 1) + digits
+        result += digits[:-scale] + decimal_separator + digits[-scale:]
+        if scale < min_decimal:
+            result += "0" * (min_decimal - scale)
+    else:
+        result += digits
+        if min_decimal > 0:
+            result += decimal_separator + ("0" * min_decimal)
+    return result
+
+# Only ints are memoized: hashing a Fraction costs about as much as formatting it.
+_format_number_exact_cached = functools.lru_cache(maxsize=1 << 16, typed=True)(_format_number_exact_fast)
+
+def _format_number_exact_decimal(amount, decimal_separator, min_decimal):
     if isinstance(amount, int):
         amount = Decimal(amount) / Decimal(100)
     else:
@@ -80,19 +140,20 @@ def format_number_exact(amount, format_args, min_decimal=0):
     if exponent < 0:
         if len(digits) < abs(exponent):
             digits = "0" * (abs(exponent) - len(digits)) + digits
-        digits = digits[:exponent] + format_args.decimal_separator + digits[exponent:]
-        if digits[0] == format_args.decimal_separator:
+        digits = digits[:exponent] + decimal_separator + digits[exponent:]
+        if digits[0] == decimal_separator:
             digits = "0" + digits
         if len(digits[exponent:]) < min_decimal:
             digits += "0" * (min_decimal - len(digits[exponent:]))
     else:
         digits += "0" * exponent
         if min_decimal > 0:
-            digits += format_args.decimal_separator + ("0" * min_decimal)
+            digits += decimal_separator + ("0" * min_decimal)
     result += digits
 
     return result
 
+@functools.lru_cache(maxsize=None)
 def escape_commodity(commodity):
     # > If the commodity name contains non-letters (spaces, numbers, or punctuation), you must always write it inside double quotes ("green apples", "ABC123").
     # https://hledger.org/1.32/hledger.html
@@ -110,41 +171,141 @@ def sanitize_description(text):
 def format_date(date):
     return str(date)
 
+class Extractor:
+    """
+    Extracts fields from texts like import_text. fields maps each field name to a (regex, parser)
+    tuple, the parser is called with the first match of the regex and the field is None if it does
+    not match. The regexes and the result type are only created once, so an Extractor should be
+    reused for all documents of a kind.
+    """
+    def __init__(self, fields):
+        self.result_type = collections.namedtuple("ImportResult", fields.keys())
+        # Searching each compiled regex on its own is faster than one alternation over all of them,
+        # as re skips to the literal prefix of a regex and cannot do so for an alternation.
+        self._patterns = [re.compile(regex) for regex, _ in fields.values()]
+        self._parsers = [parser for _, parser in fields.values()]
+
+    def extract(self, text):
+        return self._extract(text, self._parsers)
+
+    def extract_many(self, texts):
+        return [self._extract(text, self._parsers) for text in texts]
+
+    def _extract(self, text, parsers):
+        result = []
+        for pattern, parser in zip(self._patterns, parsers):
+            match = pattern.search(text)
+            result.append(parser(match) if match else None)
+        return self.result_type._make(result)
+
+@functools.lru_cache(maxsize=64)
+def _extractor(spec):
+    # Keyed by the names and regexes only: parsers are often lambdas, which differ on every call.
+    return Extractor({name: (regex, None) for name, regex in spec})
+
 def import_text(text, fields):
-    result = dict()
-    for name, (regex, parser) in fields.items():
-        match = re.search(regex, text)
-        if match:
-            result[name] = parser(match)
-        else:
-            result[name] = None
-    return collections.namedtuple("ImportResult", fields.keys())(**result)
+    extractor = _extractor(tuple((name, regex) for name, (regex, _) in fields.items()))
+    return extractor._extract(text, [parser for _, parser in fields.values()])
 
 def parse_date_dmy(match):
     return datetime.date(year=int(match[3]), month=int(match[2]), day=int(match[1]))
 
+# The values of a column, with None for the rejected rows, and the indices of the rejected rows
+Parsed = collections.namedtuple("Parsed", ("values", "rejected"))
+
+def _parse_column(values, parse):
+    # Columns repeat the same dates and often the same amounts, so each distinct value is only parsed once.
+    parsed = dict()
+    result = []
+    rejected = []
+    for i, value in enumerate(values):
+        key = value if isinstance(value, str) else (repr(value),)
+        if key not in parsed:
+            try:
+                parsed[key] = parse(value)
+            except (ValueError, TypeError, AttributeError, OverflowError, ZeroDivisionError, KeyError):
+                parsed[key] = None
+        value = parsed[key]
+        if value is None:
+            rejected.append(i)
+        result.append(value)
+    return Parsed(result, rejected)
+
+def parse_dates_dmy(values, separator="."):
+    """
+    Parses a column of day, month and year, given either as strings separated by separator or
+    as (day, month, year) sequences, to dates.
+    """
+    def parse(value):
+        if isinstance(value, str) and len(value) == 10 and value[2] == separator and value[5] == separator:
+            # Fast path for dd.mm.yyyy
+            return datetime.date(int(value[6:]), int(value[3:5]), int(value[:2]))
+        day, month, year = value.split(separator) if isinstance(value, str) else value
+        return datetime.date(int(year), int(month), int(day))
+    return _parse_column(values, parse)
+
+# We have learnt nothing from y2k
+def parse_dates_dmy_without_century(values, statement_start_year, statement_end_year, separator="."):
+    """
+    Like parse_dates_dmy for two-digit years, which must be the last two digits of the start or
+    the end year of the statement. Rows with other years are rejected.
+    """
+    assert (statement_end_year - statement_start_year) in [0, 1], "Non consecutive statement years are not supported"
+    years = {statement_end_year % 100: statement_end_year, statement_start_year % 100: statement_start_year}
+    def parse(value):
+        day, month, yy = value.split(separator) if isinstance(value, str) else value
+        return datetime.date(years[int(yy)], int(month), int(day))
+    return _parse_column(values, parse)
+
+_DECIMAL = re.compile(r"([+-]?)(\d+)(?:\.(\d*))?")
+
+def parse_nums(values, decimal_separator=",", thousands_separator=None, scale=None):
+    """
+    Parses a column of numbers to Fractions or, if scale is set, to integers in units of
+    10 ** -scale, e.g. cents for scale 2. Rows that are not numbers, or that have more decimals
+    than scale, are rejected. Besides plain decimals, everything Fraction accepts is parsed.
+    """
+    table = {ord(decimal_separator): "."}
+    if thousands_separator is not None:
+        table[ord(thousands_separator)] = None
+    def parse(value):
+        value = value.translate(table)
+        match = _DECIMAL.fullmatch(value)
+        if match:
+            # Fast path for plain decimals
+            sign, whole, decimals = match.groups()
+            decimals = (decimals or "").rstrip("0")
+            mantissa = int(whole + decimals)
+            if sign == "-":
+                mantissa = -mantissa
+            if scale is None:
+                return Fraction(mantissa, 10 ** len(decimals))
+            if len(decimals) > scale:
+                raise ValueError(f"More than {scale} decimals")
+            return mantissa * 10 ** (scale - len(decimals))
+        number = Fraction(value)
+        if scale is None:
+            return number
+        number *= 10 ** scale
+        if number.denominator != 1:
+            raise ValueError(f"More than {scale} decimals")
+        return number.numerator
+    return _parse_column(values, parse)
+
 def parse_date_ddmmyyyy(ddmmyyyy):
     return datetime.date(year=int(ddmmyyyy[2]), month=int(ddmmyyyy[1]), day=int(ddmmyyyy[0]))
 
 # We have learnt nothing from y2k
 def parse_date_ddmmyy_without_century(statement_start_year, statement_end_year, ddmmyy):
     assert (statement_end_year - statement_start_year) in [0, 1], "Non consecutive statement years are not supported"
-    statement_start_century = int(str(statement_start_year)[0:2])
-    statement_start_yy = int(str(statement_start_year)[2:4])
-    statement_end_yy = int(str(statement_end_year)[2:4])
-    statement_end_century = int(str(statement_end_year)[0:2])
     yy = int(ddmmyy[2])
-    mm = int(ddmmyy[1])
-    dd = int(ddmmyy[0])
-    yyyy = None
-    if yy == statement_start_yy:
-        yyyy = int(str(statement_start_century) + str(yy))
-    elif yy == statement_end_yy:
-        yyyy = int(str(statement_end_century) + str(yy))
+    if yy == statement_start_year % 100:
+        yyyy = statement_start_year
+    elif yy == statement_end_year % 100:
+        yyyy = statement_end_year
     else:
         assert False, "Statement entry date was neither in start nor in end year"
-
-    return datetime.date(year=yyyy, month=mm, day=dd)
+    return datetime.date(year=yyyy, month=int(ddmmyy[1]), day=int(ddmmyy[0]))
 
 def parse_num_us(str):
     return Fraction(str.replace(",", ""))
@@ -159,4 +320,4 @@ def parse_num_de_from_match(match):
     return parse_num_de(match[1])
 
 def parse_num_str(str, decimal_separator=","):
-    return Fraction(str.replace(decimal_separator, "."))
\ No newline at end of file
+    return Fraction(str.replace(decimal_separator, "."))